@@ -2,14 +2,61 @@ from PrototypeDumperDevice import *
 
 
 class AdlinkADC(PrototypeDumperDevice):
-    def __init__(self, device_name='binp/nbi/adc0', folder="ADC_0", **kwargs):
+    def __init__(self, device_name='binp/nbi/adc0', folder="ADC_0", use_events=False, **kwargs):
+        self.use_events = use_events
+        # saved channels: list of (Channel, save_data, save_log, x attribute name or None)
+        self.channels = None
+        self.channels_time = 0.0
         super().__init__(device_name, **kwargs)
         self.shot_time = 1.0
         self.folder = folder
         self.shot = -7
         self.shot = self.read_shot()
 
+    def activate(self):
+        if self.active:
+            return True
+        if not super().activate():
+            return False
+        if self.use_events:
+            self.subscribe_change_event("Shot_id")
+        # channel table is rebuilt for (re)connected device
+        try:
+            self.read_channels()
+        except:
+            self.channels = None
+            log_exception("%s channel list read error", self.name)
+        return True
+
+    def read_channels(self):
+        # build table of saved channels with properties, reused by next shots
+        attributes = self.device.get_attribute_list()
+        names = [attr for attr in attributes if attr.startswith("chany")]
+        # read properties of all channels by one database call
+        PropertyCache.prefetch(self.device, names)
+        channels = []
+        for attr in names:
+            channel = PrototypeDumperDevice.Channel(self.device, attr)
+            channel.logger = self.logger
+            properties = channel.read_properties()
+            # save_data and save_log flags
+            sdf = self.as_boolean(properties.get("save_data", [False])[0])
+            slf = self.as_boolean(properties.get("save_log", [False])[0])
+            if sdf or slf:
+                x_name = attr.replace('y', 'x')
+                channels.append((channel, sdf, slf, x_name if x_name in attributes else None))
+        self.channels = channels
+        self.channels_time = time.time()
+        return channels
+
+    def refresh_channels(self):
+        # channel table is rebuilt on next shot
+        self.channels = None
+
     def read_shot(self):
+        # use value from last change event if events are delivered
+        if self.event_id is not None and not self.event_error and self.event_value is not None:
+            return self.event_value
         try:
             shot = self.device.read_attribute("Shot_id").value
             return shot
@@ -36,46 +83,47 @@ class AdlinkADC(PrototypeDumperDevice):
         self.shot = ns
         return True
 
-    def save(self, log_file, zip_file, folder=None):
+    def acquire(self, folder=None):
         if folder is None:
             folder = self.folder
-        attributes = self.device.get_attribute_list()
-        for attr in attributes:
-            if attr.startswith("chany"):
-                channel = PrototypeDumperDevice.Channel(self.device, attr)
-                channel.logger = self.logger
-                properties = channel.read_properties()
-                # save_data and save_log flags
-                sdf = self.as_boolean(properties.get("save_data", [False])[0])
-                slf = self.as_boolean(properties.get("save_log", [False])[0])
-                properties_saved = False
-                log_saved = False
-                data_saved = False
-                retry_count = 3
-                while retry_count > 0:
-                    try:
-                        if sdf or slf:
-                            if channel.y is None:
-                                channel.read_y()
-                            if channel.x is None:
-                                channel.read_x()
-                        # Save signal properties
-                        if sdf or slf and not properties_saved:
-                            if channel.save_properties(zip_file, folder):
-                                properties_saved = True
-                        # Save log
-                        if slf and not log_saved:
-                            channel.save_log(log_file)
-                            log_saved = True
-                        # Save signal data
-                        if sdf and not data_saved:
-                            channel.save_data(zip_file, folder)
-                            data_saved = True
-                        break
-                    except:
-                        log_exception("%s channel save exception", self.name)
-                        retry_count -= 1
-                    if retry_count > 0:
-                        self.logger.debug("Retries reading %s" % self.name)
-                    if retry_count == 0:
-                        self.logger.warning("Error reading %s" % self.name)
+        record = ShotRecord(self.name, self.save_format)
+        # channel properties and flags are refreshed as often as PropertyCache entries expire
+        if self.channels is None or (time.time() - self.channels_time) > PropertyCache.get_ttl(self.name):
+            self.read_channels()
+        # read all y and x data by one call, failed channels are read one by one below.
+        # x depends on ADC rate and trigger, so it is read every shot
+        names = [channel.name for channel, sdf, slf, x_name in self.channels]
+        names += [x_name for channel, sdf, slf, x_name in self.channels if x_name is not None]
+        try:
+            values = self.read_attributes(names)
+        except:
+            values = {}
+            self.logger.debug('%s read_attributes error', self.name, exc_info=True)
+        for channel, sdf, slf, x_name in self.channels:
+            channel.prefetched = values
+            channel.y = None
+            x = channel.x
+            retry_count = 3
+            while retry_count > 0:
+                try:
+                    if channel.y is None:
+                        channel.read_y()
+                    if x_name is not None:
+                        channel.read_x(x_name)
+                        # unchanged x keeps previous array, mark ranges cached for it are reused
+                        if x is not None and channel.x is not None and numpy.array_equal(x, channel.x):
+                            channel.x = x
+                    record.add_channel(channel.snapshot(slf), folder, slf, sdf)
+                    break
+                except:
+                    log_exception("%s channel read exception", self.name)
+                    retry_count -= 1
+                    record.retries += 1
+                if retry_count > 0:
+                    self.logger.debug("Retries reading %s" % self.name)
+                if retry_count == 0:
+                    self.logger.warning("Error reading %s" % self.name)
+                    # attribute list may be changed, rebuild channel table
+                    self.channels = None
+            channel.prefetched = {}
+        return record
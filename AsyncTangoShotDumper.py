@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+asyncio version of Tango dumper
+"""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from TangoShotDumper import TangoShotDumper, log_exception
+
+
+class AsyncTangoShotDumper(TangoShotDumper):
+    _name = 'Async Tango Shot Dumper'
+
+    def __init__(self, config_file_name=None):
+        super().__init__(config_file_name)
+        self.device_timeout = 10.0
+        self.executor = None
+        # items with blocking calls still running after timeout
+        self.busy = set()
+        # prepare_items call still running after timeout
+        self.prepare_future = None
+
+    def set_config(self):
+        result = super().set_config()
+        # timeout for every activation, shot check or read of one item
+        self.device_timeout = self.config.get('device_timeout', 10.0)
+        # every item may keep one thread busy after timeout
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(max_workers=max(self.workers, len(self.dumper_items), 1))
+        return result
+
+    async def call(self, item, function, *args):
+        # run blocking item method in executor with per item timeout
+        if item in self.busy:
+            self.logger.debug('%s is busy', item.name)
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(function, *args))
+        self.busy.add(item)
+        future.add_done_callback(lambda f: self.busy.discard(item))
+        timeout = getattr(item, 'timeout', self.device_timeout)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning('%s timeout %s s', item.name, timeout)
+        except Exception:
+            log_exception(self, '%s exception', item.name, level=logging.WARNING)
+        return None
+
+    async def activate_async(self):
+        results = await asyncio.gather(*[self.call(item, item.activate) for item in self.dumper_items])
+        return sum([1 for r in results if r])
+
+    async def check_new_shot_async(self):
+        results = await asyncio.gather(*[self.call(item, item.new_shot) for item in self.dumper_items
+                                         if item.active])
+        if any(results):
+            self.shot_number_value += 1
+            self.write_shot_number(self.shot_number_value)
+            self.write_shot_time(time.time())
+            return True
+        return False
+
+    async def prepare_items_async(self, items):
+        # previous prepare is still blocked, items are read one by one
+        if self.prepare_future is not None and not self.prepare_future.done():
+            self.logger.debug('Prepare items is busy')
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self.prepare_items, items)
+        self.prepare_future = future
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.device_timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning('Prepare items timeout %s s', self.device_timeout)
+
+    async def process_async(self):
+        try:
+            # activate items in self.dumper_items
+            if await self.activate_async() <= 0:
+                self.logger.info("No active devices")
+                return
+            # check for new shot
+            t0 = time.time()
+            if not await self.check_new_shot_async():
+                return
+            self.timing = {'detect': time.time() - t0}
+            # new shot - save signals
+            if self.writer is not None:
+                header = self.shot_header()
+            else:
+                t1 = time.time()
+                self.open_shot()
+                self.add_timing('write', time.time() - t1)
+            items = [item for item in self.dumper_items if item.active]
+            t1 = time.time()
+            await self.prepare_items_async(items)
+            self.add_span('read', t1, time.time())
+            records = await asyncio.gather(*[self.call(item, self.read_item, item) for item in items])
+            self.add_span_timing()
+            buffers = []
+            for item, record in zip(items, records):
+                if record is None:
+                    self.logger.warning('No data from %s', item.name)
+                    continue
+                buffers.append(record)
+            if self.writer is not None:
+                # wait for free place in write queue without blocking other dumpers
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.submit_shot, header, buffers, t0)
+            else:
+                # write in configured order
+                for buffer in buffers:
+                    self.flush_item(buffer, self.log_file, self.zip_file)
+                t1 = time.time()
+                self.close_shot()
+                self.add_timing('write', time.time() - t1)
+                self.timing['total'] = time.time() - t0
+                self.shot_timing.add(self.timing, self.shot_number_value)
+        except Exception:
+            log_exception(self, "Unexpected exception")
+        print(self.time_stamp(), "Waiting for next shot ...")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.wait_shot_event, self.config['sleep'])
+            try:
+                await self.process_async()
+            except Exception:
+                log_exception(self, "%s Process exception", self)
+
+
+if __name__ == "__main__":
+    tsd = AsyncTangoShotDumper()
+    if tsd.set_config():
+        asyncio.run(tsd.run())
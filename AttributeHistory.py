@@ -0,0 +1,26 @@
+import numpy
+import tango
+
+HISTORY_DTYPE = numpy.dtype([('value', numpy.float64), ('time', numpy.float64), ('valid', numpy.bool_)])
+
+
+def history_arrays(history):
+    # values, times and validity mask of attribute_history() result in one pass,
+    # values of not valid points are nan
+    valid = tango.AttrQuality.ATTR_VALID
+    nan = numpy.nan
+    records = numpy.array([(h.value if h.quality == valid else nan, h.time.totime(), h.quality == valid)
+                           for h in history], dtype=HISTORY_DTYPE)
+    return records['value'], records['time'], records['valid']
+
+
+def history_image(history, n: int = None, scale: float = 1.0):
+    # [[time, value*scale], ...] image for history server, n rows, missing rows are zero
+    y, t, valid = history_arrays(history)
+    if n is None:
+        n = len(y)
+    m = min(n, len(y))
+    image = numpy.zeros((n, 2))
+    image[:m, 0] = t[:m]
+    image[:m, 1] = y[:m] * scale
+    return image
@@ -0,0 +1,260 @@
+"""
+Bulk encoders for channel data saved by shot dumpers
+"""
+import io
+import struct
+
+import numpy
+
+from ShotDedup import read_entry
+
+CRLF = '\r\n'
+SAVE_FORMATS = ('txt', 'npy', 'f32')
+# f32 payload: magic, header version, number of columns, number of rows,
+# followed by rows of little-endian float32 values
+F32_MAGIC = b'TSDB'
+F32_HEADER = struct.Struct('<4sHHI')
+# lines or rows per chunk of streamed channel data
+CHUNK_LINES = 65536
+
+
+def loop_dtype(a):
+    # dtype of python loop sum "s = 0.0; s += a[k]" on running NumPy:
+    # float64 for integer data, for float32 data float64 with NumPy 1 and float32 with NumPy 2
+    a = numpy.asarray(a)
+    return numpy.asarray(0.0 + a.dtype.type(0)).dtype
+
+
+def _block_sums(a, avg: int):
+    # sums of consecutive avg-length blocks and of the trailing partial block.
+    # cumulative sums add samples in the same order and dtype as a plain python loop,
+    # so formatted output is byte-identical to the per-sample implementation
+    n = len(a)
+    d = n // avg
+    sums = numpy.cumsum(a[:d * avg].reshape((d, avg)), axis=1)[:, -1] if d > 0 else numpy.empty(0, a.dtype)
+    tail = a[d * avg:]
+    return sums, tail
+
+
+def _as_array(a, dtype=None):
+    # flat array in accumulation dtype, None - dtype of per-sample loop
+    if dtype is None:
+        dtype = loop_dtype(a)
+    return numpy.asarray(a).ravel().astype(dtype, copy=False)
+
+
+def average(a, avg: int = 1, dtype=None):
+    # block averaging, trailing partial block is averaged over its own length
+    a = _as_array(a, dtype)
+    if avg < 1:
+        avg = 1
+    if avg == 1:
+        return a
+    sums, tail = _block_sums(a, avg)
+    result = sums / float(avg)
+    if len(tail) > 0:
+        result = numpy.append(result, numpy.cumsum(tail)[-1:] / float(len(tail)))
+    return result
+
+
+def average_channel(a, avg: int = 1, dtype=None):
+    # block averaging with PrototypeDumperDevice.Channel layout:
+    # samples up to n-2 are averaged in blocks, the trailing partial block
+    # is closed by the last sample (sample n-2 is skipped)
+    a = _as_array(a, dtype)
+    n = len(a)
+    if n <= 0:
+        return a
+    if avg < 1:
+        avg = 1
+    sums, tail = _block_sums(a[:max(n - 2, 0)], avg)
+    tail = numpy.append(tail, a[n - 1])
+    return numpy.append(sums / float(avg), numpy.cumsum(tail)[-1:] / float(len(tail)))
+
+
+def format_lines(fmt: str, *columns):
+    # format rows of columns in one operation, lines are separated by CRLF without trailing CRLF
+    if len(columns) <= 0:
+        return ''
+    n = min([len(c) for c in columns])
+    if n <= 0:
+        return ''
+    if len(columns) == 1:
+        values = columns[0][:n].tolist()
+    else:
+        values = numpy.column_stack([c[:n] for c in columns]).ravel().tolist()
+    return (CRLF.join([fmt] * n) % tuple(values)).replace(",", ".")
+
+
+def channel_text(y, x=None, avg: int = 1):
+    # text representation of channel data: "y" or "x; y" lines
+    if numpy.ndim(y) == 0:
+        return ('%f' % y).replace(",", ".")
+    if x is None:
+        return format_lines('%f', average_channel(y, avg))
+    n = min(len(x), len(y))
+    return format_lines('%f; %f', average_channel(x[:n], avg), average_channel(y[:n], avg))
+
+
+def uniform_x(x, avg: int = 1, rtol: float = 1e-6):
+    # (x0, dx, x_last) if averaged x is uniformly spaced up to the last line, else None.
+    # The last line of Channel layout averages the trailing partial block, so it is kept separately
+    xa = average_channel(x, avg)
+    m = len(xa)
+    if m < 3:
+        return None
+    dx = (xa[m - 2] - xa[0]) / (m - 2)
+    if dx == 0.0 or not numpy.isfinite(dx):
+        return None
+    if numpy.max(numpy.abs(numpy.diff(xa[:m - 1]) - dx)) > rtol * abs(dx):
+        return None
+    return float(xa[0]), float(dx), float(xa[m - 1])
+
+
+def restore_x(n: int, x0: float, dx: float, x_last: float):
+    # x column replaced by uniform_x() parameters
+    x = x0 + dx * numpy.arange(n, dtype=numpy.float64)
+    if n > 0:
+        x[-1] = x_last
+    return x
+
+
+def channel_arrays(y, x=None, avg: int = 1):
+    # averaged channel data as 2D float64 array with "y" or "x, y" columns, accumulated in float64
+    if numpy.ndim(y) == 0:
+        return numpy.array([[float(y)]])
+    if x is None:
+        return average_channel(y, avg, numpy.float64).reshape((-1, 1))
+    n = min(len(x), len(y))
+    return numpy.column_stack((average_channel(x[:n], avg, numpy.float64),
+                               average_channel(y[:n], avg, numpy.float64)))
+
+
+def channel_bytes(y, x=None, avg: int = 1, save_format: str = 'npy'):
+    # binary representation of channel data in 'npy' or 'f32' format
+    data = channel_arrays(y, x, avg)
+    if save_format == 'npy':
+        buf = io.BytesIO()
+        numpy.save(buf, data)
+        return buf.getvalue()
+    if save_format == 'f32':
+        return F32_HEADER.pack(F32_MAGIC, 1, data.shape[1], data.shape[0]) + data.astype('<f4').tobytes()
+    raise ValueError('Unknown save format %s' % save_format)
+
+
+def channel_chunks(y, x=None, avg: int = 1, save_format: str = 'txt', lines: int = CHUNK_LINES):
+    # channel data in save_format as sequence of bytes chunks,
+    # joined chunks are equal to channel_text() or channel_bytes() result
+    if save_format == 'txt':
+        if numpy.ndim(y) == 0:
+            yield channel_text(y).encode()
+            return
+        if x is None:
+            fmt = '%f'
+            columns = (average_channel(y, avg),)
+        else:
+            fmt = '%f; %f'
+            n = min(len(x), len(y))
+            columns = (average_channel(x[:n], avg), average_channel(y[:n], avg))
+        n = min([len(c) for c in columns])
+        for i in range(0, n, lines):
+            s = format_lines(fmt, *[c[i:i + lines] for c in columns])
+            if i > 0:
+                s = CRLF + s
+            yield s.encode()
+        return
+    data = channel_arrays(y, x, avg)
+    if save_format == 'npy':
+        buf = io.BytesIO()
+        numpy.lib.format.write_array_header_1_0(buf, numpy.lib.format.header_data_from_array_1_0(data))
+        yield buf.getvalue()
+        for i in range(0, data.shape[0], lines):
+            yield data[i:i + lines].tobytes()
+    elif save_format == 'f32':
+        yield F32_HEADER.pack(F32_MAGIC, 1, data.shape[1], data.shape[0])
+        for i in range(0, data.shape[0], lines):
+            yield data[i:i + lines].astype('<f4').tobytes()
+    else:
+        raise ValueError('Unknown save format %s' % save_format)
+
+
+def mark_ranges(x, marks: dict):
+    # indexes of x within marks {name: (start, end)}: slices for non-decreasing x, boolean masks otherwise
+    x = numpy.asarray(x)
+    if len(marks) <= 0:
+        return {}
+    names = list(marks)
+    if x.ndim == 1 and numpy.all(x[1:] >= x[:-1]):
+        starts = numpy.searchsorted(x, [marks[name][0] for name in names], 'left')
+        ends = numpy.searchsorted(x, [marks[name][1] for name in names], 'right')
+        return {name: slice(int(i0), int(max(i0, i1))) for name, i0, i1 in zip(names, starts, ends)}
+    return {name: numpy.logical_and(x >= marks[name][0], x <= marks[name][1]) for name in names}
+
+
+def mark_means(y, ranges: dict):
+    # mean of y within each mark range, nan for empty ranges.
+    # a slice selects the same samples as the mask, so means are equal to masked ones
+    result = {}
+    for name, index in ranges.items():
+        values = y[index]
+        if len(values) > 0:
+            result[name] = values.mean()
+        else:
+            result[name] = float('nan')
+    return result
+
+
+def decode(entry: str, data):
+    # restore channel arrays from zip entry, returns (x, y), x is None for "y" only data
+    if entry.endswith('.npy'):
+        values = numpy.load(io.BytesIO(data))
+    elif entry.endswith('.f32'):
+        magic, version, columns, rows = F32_HEADER.unpack_from(data)
+        if magic != F32_MAGIC:
+            raise ValueError('Wrong f32 header in %s' % entry)
+        values = numpy.frombuffer(data, dtype='<f4', count=rows * columns, offset=F32_HEADER.size)
+        values = values.reshape((rows, columns))
+    else:
+        if isinstance(data, str):
+            data = data.encode()
+        lines = data.strip().split(b'\n', 1)
+        if len(lines[0]) <= 0:
+            return None, numpy.empty(0)
+        values = numpy.loadtxt(io.BytesIO(data), delimiter=';', dtype=numpy.float64, ndmin=2)
+    if values.ndim == 1:
+        values = values.reshape((-1, 1))
+    if values.shape[1] == 1:
+        return None, values[:, 0]
+    return values[:, 0], values[:, 1]
+
+
+def param_entry(entry: str):
+    # name of properties entry for channel data entry
+    folder, _, file_name = entry.rpartition('/')
+    name = 'param' + file_name.rsplit('.', 1)[0] + '.txt'
+    return folder + '/' + name if folder else name
+
+
+def read_params(zip_file, entry: str, folder: str = None):
+    # channel properties saved by Channel.save_properties, name -> str value
+    params = {}
+    try:
+        text = read_entry(zip_file, param_entry(entry), folder).decode(errors='replace')
+    except KeyError:
+        return params
+    for line in text.splitlines():
+        key, sep, value = line.partition('=')
+        if sep:
+            params[key.strip()] = value.strip()
+    return params
+
+
+def read_channel(zip_file, entry: str, folder: str = None):
+    # read channel arrays saved by Channel.save_data from opened zip file,
+    # x written as x0, dx, x_last properties is restored, references to previous shots are resolved
+    x, y = decode(entry, read_entry(zip_file, entry, folder))
+    if x is None and len(y) > 0:
+        params = read_params(zip_file, entry, folder)
+        if 'dx' in params:
+            x = restore_x(len(y), float(params['x0']), float(params['dx']), float(params['x_last']))
+    return x, y
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import tango
+
+
+class ProxyBackOff(RuntimeError):
+    # proxy creation is not retried during back off interval after failure
+    pass
+
+
+class DeviceProxyPool:
+    # process wide pool of tango.DeviceProxy shared by dumper items and history readers
+    # default client timeout for new proxies, ms, None - tango default
+    timeout = None
+    # default minimal interval between reconnection attempts to failed device, s
+    back_off = 10.0
+    _lock = threading.RLock()
+    # device name -> {'proxy', 'ready', 'time', 'error', 'ping_time', 'settings'},
+    # ready - result of last ping, time - last proxy creation attempt,
+    # settings - owner -> (timeout, back_off) requested by owner for this device
+    _devices = {}
+
+    @classmethod
+    def _state(cls, name: str):
+        key = name.lower()
+        state = cls._devices.get(key)
+        if state is None:
+            state = {'proxy': None, 'ready': False, 'time': 0.0, 'error': None, 'ping_time': 0.0, 'settings': {}}
+            cls._devices[key] = state
+        return state
+
+    @classmethod
+    def _timeout(cls, state):
+        # the longest timeout requested by device owners
+        values = [value[0] for value in state['settings'].values() if value[0] is not None]
+        return max(values) if values else cls.timeout
+
+    @classmethod
+    def _back_off(cls, state):
+        # the shortest back off requested by device owners
+        values = [value[1] for value in state['settings'].values() if value[1] is not None]
+        return min(values) if values else cls.back_off
+
+    @classmethod
+    def get(cls, name: str):
+        # returns shared proxy, creation errors are raised again during back off interval
+        with cls._lock:
+            state = cls._state(name)
+            if state['proxy'] is not None:
+                return state['proxy']
+            if state['error'] is not None and (time.time() - state['time']) < cls._back_off(state):
+                raise ProxyBackOff('%s proxy creation failed %.1f s ago' %
+                                   (name, time.time() - state['time'])) from state['error']
+            state['time'] = time.time()
+            try:
+                proxy = tango.DeviceProxy(name)
+                timeout = cls._timeout(state)
+                if timeout is not None:
+                    proxy.set_timeout_millis(int(timeout))
+            except Exception as ex:
+                state['error'] = ex
+                state['ready'] = False
+                raise
+            state['proxy'] = proxy
+            state['error'] = None
+            return proxy
+
+    @classmethod
+    def ping(cls, name: str):
+        # check if device is alive, not responding device is pinged not often than back_off
+        with cls._lock:
+            state = cls._state(name)
+            if not state['ready'] and (time.time() - state['ping_time']) < cls._back_off(state):
+                return False
+            state['ping_time'] = time.time()
+        try:
+            cls.get(name).ping()
+            ready = True
+        except:
+            ready = False
+        with cls._lock:
+            state['ready'] = ready
+        return ready
+
+    @classmethod
+    def is_ready(cls, name: str):
+        with cls._lock:
+            return cls._state(name)['ready']
+
+    @classmethod
+    def configure(cls, name: str, owner=None, timeout=None, back_off=None):
+        # client timeout, ms, and reconnection back off, s, requested by owner for device
+        with cls._lock:
+            state = cls._state(name)
+            state['settings'][owner] = (timeout, back_off)
+            cls._apply(state)
+
+    @classmethod
+    def release(cls, owner=None):
+        # drop settings of owner for all devices
+        with cls._lock:
+            for state in cls._devices.values():
+                if state['settings'].pop(owner, None) is not None:
+                    cls._apply(state)
+
+    @classmethod
+    def _apply(cls, state):
+        timeout = cls._timeout(state)
+        if state['proxy'] is not None and timeout is not None:
+            try:
+                state['proxy'].set_timeout_millis(int(timeout))
+            except:
+                pass
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Shot dumper benchmark on simulated Tango devices
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import numpy
+
+from FakeTango import FakeTangoLayer
+from ShotTiming import PHASES
+from TangoShotDumper import TangoShotDumper
+
+
+def make_config(args, out_root_dir):
+    devices = []
+    for n in range(args.adcs):
+        devices.append({"exec": "from AdlinkADC import AdlinkADC",
+                        "eval": "AdlinkADC('bench/adc/%d', folder='ADC_%d')" % (n, n)})
+    for k in range(args.scalars):
+        devices.append({"exec": "from TangoAttribute import TangoAttribute",
+                        "eval": "TangoAttribute('bench/scalar/0', 'ai%02d', folder='Scalars')" % k})
+    for k in range(args.histories):
+        devices.append({"exec": "from TangoAttributeHistory import TangoAttributeHistory",
+                        "eval": "TangoAttributeHistory('bench/scalar/0', 'ai%02d', folder='History', delta_t=%f)"
+                                % (k, args.delta_t)})
+    return {"sleep": 0.0, "log_level": logging.WARNING, "out_root_dir": out_root_dir,
+            "shot_number": 0, "shot_time": 0.0, "workers": args.workers, "compression": args.compression,
+            "devices": devices}
+
+
+def run(args):
+    layer = FakeTangoLayer(latency=args.latency, adcs=args.adcs, channels=args.channels, points=args.points,
+                           scalars=max(args.scalars, args.histories), history_depth=args.history_depth,
+                           failure_rate=args.failure_rate, seed=args.seed).install()
+    folder = tempfile.mkdtemp(prefix='dumper_benchmark_')
+    try:
+        config_file_name = os.path.join(folder, 'benchmark.json')
+        with open(config_file_name, 'w') as config_file:
+            json.dump(make_config(args, os.path.join(folder, 'data')), config_file)
+        dumper = TangoShotDumper(config_file_name)
+        if not dumper.set_config():
+            print('Dumper configuration error')
+            return None
+        timings = []
+        for shot in range(args.shots):
+            layer.trigger()
+            with contextlib.redirect_stdout(io.StringIO()):
+                dumper.process()
+            timings.append(dict(dumper.timing))
+        if args.codecs:
+            print(dumper.codec_report())
+        return timings, dict(layer.calls)
+    finally:
+        layer.uninstall()
+        if not args.keep:
+            shutil.rmtree(folder, ignore_errors=True)
+        else:
+            print('Output is kept in', folder)
+
+
+def report(timings, calls):
+    print('%-10s %10s %10s %10s %10s' % ('phase', 'mean, s', 'min, s', 'max, s', 'last, s'))
+    for phase in PHASES:
+        values = numpy.array([t.get(phase, 0.0) for t in timings])
+        if len(values) <= 0:
+            continue
+        print('%-10s %10.4f %10.4f %10.4f %10.4f' % (phase, values.mean(), values.min(), values.max(), values[-1]))
+    # sums of per item times, exceed wall time of phase when items are read by several workers
+    for key in ('read', 'encode'):
+        values = numpy.array([sum([v.get(key, 0.0) for v in t.get('items', {}).values()]) for t in timings])
+        if len(values) <= 0:
+            continue
+        print('%-10s %10.4f %10.4f %10.4f %10.4f' % (key + '_sum', values.mean(), values.min(), values.max(),
+                                                     values[-1]))
+    print('calls:', ', '.join(['%s=%d' % (k, calls[k]) for k in sorted(calls)]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Shot dumper benchmark on simulated Tango devices')
+    parser.add_argument('--shots', type=int, default=5)
+    parser.add_argument('--adcs', type=int, default=1, help='number of simulated ADC boards')
+    parser.add_argument('--channels', type=int, default=32, help='channels per ADC')
+    parser.add_argument('--points', type=int, default=100000, help='samples per channel')
+    parser.add_argument('--scalars', type=int, default=40, help='scalar TangoAttribute items')
+    parser.add_argument('--histories', type=int, default=0, help='TangoAttributeHistory items')
+    parser.add_argument('--history-depth', type=int, default=1000)
+    parser.add_argument('--delta-t', type=float, default=120.0)
+    parser.add_argument('--latency', type=float, default=0.002, help='simulated round trip, s')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='probability of failed call')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--compression', default='deflate', help='stored, deflate:N, bzip2:N or lzma')
+    parser.add_argument('--codecs', action='store_true', help='compare codecs on last shot')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help='keep output folder')
+    arguments = parser.parse_args()
+    t0 = time.time()
+    result = run(arguments)
+    if result is not None:
+        report(*result)
+        print('elapsed %.3f s' % (time.time() - t0))
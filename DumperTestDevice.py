@@ -50,11 +50,12 @@ class DumperTestDevice(PrototypeDumperDevice):
             t0 = time.time()
             signal = self.Channel(None, 1)  # PrototypeDumperDevice.Channel()
             signal.name = 'test_device_%d' % self.n
+            signal.configure(self.channel_settings)
             signal.x = numpy.linspace(0.0, 2.0 * numpy.pi, self.points)
             signal.y = numpy.sin(signal.x)
             # signal.properties = self.properties
-            # signal.properties['save_numpy'] = ['1']
-            signal.save_data(zip_file, folder)
+            # signal.properties['save_format'] = ['npy']
+            signal.save_data(zip_file, folder, self.save_format)
             # self.logger.debug('dT = %s', time.time() - t0)
             # signal.save_properties(zip_file, folder)
             # signal.save_properties(zip_file, folder)
@@ -0,0 +1,189 @@
+"""
+In-process stand-in for tango.DeviceProxy and tango.Database used by dumper benchmarks
+"""
+import random
+import threading
+import time
+
+import numpy
+import tango
+
+
+class FakeTimeVal:
+    def __init__(self, t: float):
+        self.t = t
+        self.tv_sec = int(t)
+        self.tv_usec = int((t - int(t)) * 1.0e6)
+        self.tv_nsec = 0
+
+    def totime(self):
+        return self.t
+
+
+class FakeDeviceAttribute:
+    def __init__(self, name, value, t=None, quality=tango.AttrQuality.ATTR_VALID):
+        self.name = name
+        self.value = value
+        self.quality = quality
+        self.has_failed = False
+        self.time = FakeTimeVal(time.time() if t is None else t)
+        if numpy.ndim(value) == 0:
+            self.data_format = tango.AttrDataFormat.SCALAR
+        elif numpy.ndim(value) == 1:
+            self.data_format = tango.AttrDataFormat.SPECTRUM
+        else:
+            self.data_format = tango.AttrDataFormat.IMAGE
+
+
+class FakeDevice:
+    # device model: attribute values, attribute properties and polling period
+    def __init__(self, name: str):
+        self.name = name
+        self.attributes = {}
+        self.properties = {}
+        self.period = 0
+
+    def value(self, attribute_name: str):
+        v = self.attributes[attribute_name]
+        return v() if callable(v) else v
+
+
+class FakeDatabase:
+    def __init__(self, layer=None):
+        self.layer = FakeTangoLayer.current if layer is None else layer
+
+    def get_device_attribute_property(self, device_name: str, attribute_names):
+        self.layer.call(device_name, 'get_device_attribute_property')
+        if isinstance(attribute_names, str):
+            attribute_names = [attribute_names]
+        device = self.layer.device(device_name)
+        return {name: dict(device.properties.get(name, {})) for name in attribute_names}
+
+
+class FakeDeviceProxy:
+    def __init__(self, device_name: str):
+        self.layer = FakeTangoLayer.current
+        self.device_name = device_name
+        self.layer.call(device_name, 'DeviceProxy')
+        self.layer.device(device_name)
+
+    def name(self):
+        return self.device_name
+
+    def get_device_db(self):
+        return FakeDatabase(self.layer)
+
+    def set_timeout_millis(self, timeout):
+        pass
+
+    def ping(self):
+        self.layer.call(self.device_name, 'ping')
+        return 100
+
+    def get_attribute_list(self):
+        self.layer.call(self.device_name, 'get_attribute_list')
+        return list(self.layer.device(self.device_name).attributes)
+
+    def read_attribute(self, name: str):
+        self.layer.call(self.device_name, 'read_attribute')
+        return FakeDeviceAttribute(name, self.layer.device(self.device_name).value(name))
+
+    def read_attributes(self, names):
+        self.layer.call(self.device_name, 'read_attributes')
+        device = self.layer.device(self.device_name)
+        return [FakeDeviceAttribute(name, device.value(name)) for name in names]
+
+    def subscribe_event(self, *args, **kwargs):
+        tango.Except.throw_exception('API_EventPropertiesNotSet', 'Events are not simulated', 'FakeDeviceProxy')
+
+    def unsubscribe_event(self, event_id):
+        pass
+
+    def is_attribute_polled(self, name: str):
+        return self.layer.device(self.device_name).period > 0
+
+    def get_attribute_poll_period(self, name: str):
+        return self.layer.device(self.device_name).period
+
+    def attribute_history(self, name: str, depth: int, *args, **kwargs):
+        self.layer.call(self.device_name, 'attribute_history')
+        device = self.layer.device(self.device_name)
+        n = min(int(depth), self.layer.history_depth)
+        t = time.time() - device.period / 1000.0 * numpy.arange(n)
+        values = self.layer.rng.normal(size=n)
+        return [FakeDeviceAttribute(name, float(values[i]), t[i]) for i in range(n)]
+
+
+class FakeTangoLayer:
+    # configurable set of simulated devices replacing tango.DeviceProxy and tango.Database
+    current = None
+
+    def __init__(self, latency=0.0, adcs=1, channels=32, points=100000, scalars=40, history_depth=1000,
+                 failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.history_depth = history_depth
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.rng = numpy.random.default_rng(seed)
+        self.devices = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.saved = None
+        x = numpy.linspace(0.0, 1.0, points)
+        for n in range(adcs):
+            device = self.add_device('bench/adc/%d' % n)
+            device.attributes['Shot_id'] = 0
+            for k in range(channels):
+                name = 'chany%02d' % k
+                device.attributes[name] = numpy.sin(x * (k + 1) * 2.0 * numpy.pi) + 0.01 * self.rng.normal(size=points)
+                device.attributes['chanx%02d' % k] = x
+                device.properties[name] = {'save_data': ['True'], 'save_log': ['True'], 'save_avg': ['10'],
+                                           'label': [name], 'unit': ['V'],
+                                           'mark_start': ['0.1'], 'mark_length': ['0.1'],
+                                           'zero_start': ['0.9'], 'zero_length': ['0.05']}
+        device = self.add_device('bench/scalar/0')
+        device.period = 100
+        for k in range(scalars):
+            name = 'ai%02d' % k
+            device.attributes[name] = float(k)
+            device.properties[name] = {'label': [name], 'unit': ['A']}
+
+    def add_device(self, name: str):
+        device = FakeDevice(name)
+        self.devices[name.lower()] = device
+        return device
+
+    def device(self, name: str):
+        try:
+            return self.devices[name.lower()]
+        except KeyError:
+            tango.Except.throw_exception('API_DeviceNotDefined', 'Device %s is not defined' % name, 'FakeTangoLayer')
+
+    def call(self, device_name: str, method: str):
+        # simulate network round trip and random failures
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            failed = self.failure_rate > 0.0 and self.random.random() < self.failure_rate
+        if self.latency > 0.0:
+            time.sleep(self.latency)
+        if failed:
+            tango.Except.throw_exception('API_CommunicationFailed', 'Simulated failure', device_name)
+
+    def trigger(self):
+        # new shot on all ADC devices
+        for device in self.devices.values():
+            if 'Shot_id' in device.attributes:
+                device.attributes['Shot_id'] += 1
+
+    def install(self):
+        FakeTangoLayer.current = self
+        self.saved = (tango.DeviceProxy, tango.Database)
+        tango.DeviceProxy = FakeDeviceProxy
+        tango.Database = FakeDatabase
+        return self
+
+    def uninstall(self):
+        if self.saved is not None:
+            tango.DeviceProxy, tango.Database = self.saved
+            self.saved = None
+        FakeTangoLayer.current = None
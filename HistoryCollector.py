@@ -0,0 +1,199 @@
+import sys
+import threading
+import time
+
+import numpy
+
+sys.path.append('../TangoUtils')
+from TangoUtils import config_logger
+
+from AttributeHistory import history_arrays
+from DeviceProxyPool import DeviceProxyPool
+
+
+class HistoryBuffer:
+    # ring buffer of valid (time, value) points of one polled attribute
+    def __init__(self, device_name: str, attribute_name: str, delta_t: float):
+        self.device_name = device_name
+        self.attribute_name = attribute_name
+        self.delta_t = delta_t
+        self.period = 0
+        self.capacity = 0
+        self.t = numpy.zeros(0)
+        self.y = numpy.zeros(0)
+        self.index = 0
+        self.count = 0
+        self.last_time = 0.0
+        self.fetch_time = 0.0
+        # owner -> (delta_t, interval), buffer keeps the longest delta_t and the shortest interval of its owners
+        self.owners = {}
+        self.interval = 1.0
+        self.lock = threading.Lock()
+
+    def resize(self, capacity: int):
+        t, y = self.ordered()
+        self.capacity = max(int(capacity), 1)
+        t = t[-self.capacity:]
+        y = y[-self.capacity:]
+        self.t = numpy.zeros(self.capacity)
+        self.y = numpy.zeros(self.capacity)
+        self.count = len(t)
+        self.t[:self.count] = t
+        self.y[:self.count] = y
+        self.index = self.count % self.capacity
+
+    def ordered(self):
+        if self.count <= 0:
+            return numpy.zeros(0), numpy.zeros(0)
+        i = (self.index - self.count + numpy.arange(self.count)) % self.capacity
+        return self.t[i], self.y[i]
+
+    def append(self, t, y):
+        # add points newer than already collected ones
+        index = t > self.last_time
+        t = t[index]
+        y = y[index]
+        if len(t) <= 0:
+            return 0
+        order = numpy.argsort(t)
+        t = t[order][-self.capacity:]
+        y = y[order][-self.capacity:]
+        i = (self.index + numpy.arange(len(t))) % self.capacity
+        self.t[i] = t
+        self.y[i] = y
+        self.index = (self.index + len(t)) % self.capacity
+        self.count = min(self.count + len(t), self.capacity)
+        self.last_time = t[-1]
+        return len(t)
+
+    def update(self):
+        # fetch only points polled since previous fetch
+        device = DeviceProxyPool.get(self.device_name)
+        period = device.get_attribute_poll_period(self.attribute_name)
+        if period <= 0:
+            return 0
+        if period != self.period:
+            self.period = period
+            self.resize(self.delta_t * 1000.0 / period + 10)
+        now = time.time()
+        if self.count > 0:
+            dt = now - self.last_time
+        else:
+            dt = self.delta_t
+        depth = min(int(dt * 1000.0 / period) + 10, self.capacity)
+        history = device.attribute_history(self.attribute_name, depth)
+        self.fetch_time = now
+        if len(history) <= 0:
+            return 0
+        y, t, valid = history_arrays(history)
+        return self.append(t[valid], y[valid])
+
+    def window(self, delta_t: float):
+        # returns (y, x) for last delta_t seconds
+        t, y = self.ordered()
+        index = t > (time.time() - delta_t)
+        return y[index], t[index]
+
+
+class HistoryCollector:
+    # process wide background collector of polled attribute histories
+    # default interval between incremental history fetches, s
+    interval = 1.0
+    logger = config_logger()
+    _lock = threading.Lock()
+    # (device, attribute) -> HistoryBuffer
+    _buffers = {}
+    _thread = None
+    _stop = threading.Event()
+
+    @classmethod
+    def register(cls, device_name: str, attribute_name: str, delta_t: float, owner=None, interval: float = None):
+        # collect attribute history for owner, one buffer is shared by all owners of attribute
+        if interval is None:
+            interval = cls.interval
+        key = (device_name.lower(), attribute_name.lower())
+        with cls._lock:
+            buffer = cls._buffers.get(key)
+            if buffer is None:
+                buffer = HistoryBuffer(device_name, attribute_name, delta_t)
+                cls._buffers[key] = buffer
+            buffer.owners[owner] = (delta_t, interval)
+            buffer.interval = min([value[1] for value in buffer.owners.values()])
+            if delta_t > buffer.delta_t:
+                with buffer.lock:
+                    buffer.delta_t = delta_t
+                    if buffer.period > 0:
+                        buffer.resize(delta_t * 1000.0 / buffer.period + 10)
+        cls.start()
+        return buffer
+
+    @classmethod
+    def unregister(cls, device_name: str, attribute_name: str, owner=None):
+        # stop collecting for owner, history is dropped when attribute has no owners
+        key = (device_name.lower(), attribute_name.lower())
+        with cls._lock:
+            buffer = cls._buffers.get(key)
+            if buffer is None:
+                return
+            buffer.owners.pop(owner, None)
+            if len(buffer.owners) <= 0:
+                del cls._buffers[key]
+            else:
+                buffer.interval = min([value[1] for value in buffer.owners.values()])
+
+    @classmethod
+    def window(cls, device_name: str, attribute_name: str, delta_t: float):
+        # history of last delta_t seconds from local buffer updated with new points,
+        # None if attribute is not collected
+        buffer = cls._buffers.get((device_name.lower(), attribute_name.lower()))
+        if buffer is None:
+            return None
+        with buffer.lock:
+            try:
+                buffer.update()
+            except:
+                cls.logger.debug('%s/%s history update error', device_name, attribute_name, exc_info=True)
+                if buffer.count <= 0:
+                    return None
+            return buffer.window(delta_t)
+
+    @classmethod
+    def update_all(cls):
+        with cls._lock:
+            buffers = list(cls._buffers.values())
+        for buffer in buffers:
+            if time.time() - buffer.fetch_time < buffer.interval:
+                continue
+            with buffer.lock:
+                try:
+                    buffer.update()
+                except:
+                    cls.logger.debug('%s/%s history update error', buffer.device_name, buffer.attribute_name,
+                                     exc_info=True)
+
+    @classmethod
+    def poll_interval(cls):
+        # shortest fetch interval of collected attributes
+        with cls._lock:
+            return min([buffer.interval for buffer in cls._buffers.values()] + [cls.interval])
+
+    @classmethod
+    def run(cls):
+        while not cls._stop.wait(cls.poll_interval()):
+            cls.update_all()
+
+    @classmethod
+    def start(cls):
+        with cls._lock:
+            if cls._thread is not None and cls._thread.is_alive():
+                return
+            cls._stop.clear()
+            cls._thread = threading.Thread(target=cls.run, name='HistoryCollector', daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def stop(cls):
+        cls._stop.set()
+        if cls._thread is not None:
+            cls._thread.join()
+            cls._thread = None
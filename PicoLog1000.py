@@ -2,16 +2,17 @@ from PrototypeDumperDevice import *
 
 
 class PicoLog1000(PrototypeDumperDevice):
-    def __init__(self, tango_device_name: str, folder='PicoLog'):
-        super().__init__(tango_device_name)
+    def __init__(self, tango_device_name: str, folder='PicoLog', **kwargs):
+        super().__init__(tango_device_name, **kwargs)
         self.folder = folder
 
-    def save(self, log_file, zip_file, folder=None):
+    def acquire(self, folder=None):
+        record = ShotRecord(self.name, self.save_format)
         # read data ready
         data_ready = self.device.read_attribute('data_ready').value
         if not data_ready:
             self.logger.warning("%s is not ready" % self.name)
-            return
+            return record
         # read channels list
         channels = self.device.read_attribute('channels').value
         channels_list = []
@@ -21,7 +22,7 @@ class PicoLog1000(PrototypeDumperDevice):
             pass
         if len(channels_list) <= 0:
             self.logger.warning("%s empty channels list" % self.name)
-            return
+            return record
         # read other attributes
         trigger = self.device.read_attribute('trigger').value
         sampling = self.device.read_attribute('sampling').value
@@ -31,7 +32,7 @@ class PicoLog1000(PrototypeDumperDevice):
         if trigger < points:
             trigger_offset = times[trigger]
             times -= trigger_offset
-        # save channels data and properties
+        # read channels data and properties
         for i, number in enumerate(channels_list):
             try:
                 chan = PicoLog1000.Channel(self.device, number, format='%02i')
@@ -45,11 +46,8 @@ class PicoLog1000(PrototypeDumperDevice):
                     chan.read_y()
                     # generate times values
                     chan.x = times + (i * sampling / len(channels_list))
-                    chan.save_properties(zip_file, self.folder)
-                if slf:
-                    chan.save_log(log_file)
-                if sdf:
-                    chan.save_data(zip_file, self.folder)
+                    record.add_channel(chan.snapshot(slf), self.folder, slf, sdf)
             except:
-                self.logger.warning("%s save exception" % self.name)
+                self.logger.warning("%s read exception" % self.name)
                 self.logger.debug('', exc_info=True)
+        return record
@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+
+sys.path.append('../TangoUtils')
+from TangoUtils import config_logger
+
+
+class PropertyCache:
+    # process wide cache of attribute properties read from Tango database
+    ttl = 60.0
+    # after failed database read stale properties are used and read again not earlier than retry, s
+    retry = 10.0
+    logger = config_logger()
+    _lock = threading.Lock()
+    # (device name, attribute name) -> (read time, properties dictionary)
+    _cache = {}
+    # device name -> {owner: ttl}, properties of device live for the shortest ttl of its owners
+    _ttls = {}
+
+    @staticmethod
+    def key(device_name: str, attribute_name: str):
+        return device_name.lower(), attribute_name.lower()
+
+    @classmethod
+    def set_ttl(cls, device_name: str, ttl: float, owner=None):
+        with cls._lock:
+            cls._ttls.setdefault(device_name.lower(), {})[owner] = ttl
+
+    @classmethod
+    def release(cls, owner=None):
+        # drop ttl settings of owner
+        with cls._lock:
+            for ttls in cls._ttls.values():
+                ttls.pop(owner, None)
+
+    @classmethod
+    def get_ttl(cls, device_name: str):
+        with cls._lock:
+            ttls = cls._ttls.get(device_name.lower())
+            if not ttls:
+                return cls.ttl
+            return min(ttls.values())
+
+    @classmethod
+    def get(cls, device, attribute_name: str):
+        # returns copy of properties dictionary for attribute of DeviceProxy device
+        device_name = device.name()
+        with cls._lock:
+            value = cls._cache.get(cls.key(device_name, attribute_name))
+        if value is None or (time.time() - value[0]) > cls.get_ttl(device_name):
+            cls.prefetch(device, [attribute_name])
+            with cls._lock:
+                value = cls._cache.get(cls.key(device_name, attribute_name))
+        return dict(value[1])
+
+    @classmethod
+    def prefetch(cls, device, attribute_names):
+        # read properties of all expired attributes of device by one database call
+        device_name = device.name()
+        t0 = time.time()
+        ttl = cls.get_ttl(device_name)
+        with cls._lock:
+            names = []
+            for name in attribute_names:
+                value = cls._cache.get(cls.key(device_name, name))
+                if value is None or (t0 - value[0]) > ttl:
+                    names.append(name)
+        if len(names) <= 0:
+            return 0
+        try:
+            db = device.get_device_db()
+            properties = db.get_device_attribute_property(device_name, names)
+        except:
+            with cls._lock:
+                stale = [name for name in names if cls.key(device_name, name) in cls._cache]
+                # keep serving stale properties, database is asked again after retry interval
+                for name in stale:
+                    key = cls.key(device_name, name)
+                    cls._cache[key] = (t0 + min(cls.retry, ttl) - ttl, cls._cache[key][1])
+            if len(stale) < len(names):
+                raise
+            cls.logger.warning('%s properties read error, cached values are used', device_name)
+            cls.logger.debug('', exc_info=True)
+            return 0
+        with cls._lock:
+            for name in names:
+                cls._cache[cls.key(device_name, name)] = (t0, properties.get(name, {}))
+        return len(names)
+
+    @classmethod
+    def invalidate(cls, device_name: str = None, attribute_name: str = None):
+        # remove all, device or attribute entries from cache
+        with cls._lock:
+            if device_name is None:
+                cls._cache.clear()
+                return
+            for key in list(cls._cache):
+                if key[0] == device_name.lower() and (attribute_name is None or key[1] == attribute_name.lower()):
+                    del cls._cache[key]
@@ -1,3 +1,4 @@
+import copy
 import sys
 import time
 import logging
@@ -11,6 +12,12 @@ from tango import DevFailed
 sys.path.append('../TangoUtils')
 from TangoUtils import config_logger, log_exception
 
+from DataEncoder import SAVE_FORMATS, channel_text, channel_bytes, channel_chunks, uniform_x, mark_ranges, mark_means
+from DeviceProxyPool import DeviceProxyPool, ProxyBackOff
+from PropertyCache import PropertyCache
+from ShotRecord import ShotRecord
+from ZipCompressor import write_stream
+
 TRUE_VALUES = ('true', 'on', '1', 'y', 'yes')
 FALSE_VALUES = ('false', 'off', '0', 'n', 'no')
 
@@ -18,6 +25,11 @@ FALSE_VALUES = ('false', 'off', '0', 'n', 'no')
 class PrototypeDumperDevice:
 
     class Channel:
+        # channels with at least stream_points samples are written chunk by chunk, 0 - never
+        stream_points = 0
+        # relative tolerance of x step to save uniform x as x0, dx, x_last properties, 0 - always save x
+        uniform_x_tolerance = 0.0
+
         def __init__(self, device, channel, prefix='chany', format='%03i'):
             self.logger = config_logger()
             self.device = device
@@ -26,14 +38,48 @@ class PrototypeDumperDevice:
             else:
                 self.name = str(channel)
             self.file_name = self.name
+            self.device_name = ''
             self.y = None
             self.y_attr = None
             self.x = None
             self.x_attr = None
             self.properties = None
+            # attribute values read in advance by read_attributes
+            self.prefetched = {}
+            # parsed marks and their index ranges on x, kept while properties and x are unchanged
+            self.mark_cache = {}
+
+        def configure(self, settings: dict):
+            # per item values of class level settings, e.g. stream_points
+            for name, value in settings.items():
+                setattr(self, name, value)
+
+        def snapshot(self, marks: bool = False):
+            # detached copy of channel data and properties for the encode stage.
+            # marks - mark ranges are evaluated before copy, so they are cached by this channel for next shots
+            if marks and self.x is not None:
+                try:
+                    self.mark_ranges()
+                except:
+                    pass
+            channel = copy.copy(self)
+            if self.device is not None:
+                channel.device_name = self.device.name()
+            channel.device = None
+            channel.prefetched = {}
+            channel.properties = dict(self.read_properties())
+            channel.mark_cache = dict(self.mark_cache)
+            return channel
+
+        def read_attribute(self, name: str):
+            # use value read in advance if available
+            attr = self.prefetched.pop(name, None)
+            if attr is None:
+                attr = self.device.read_attribute(name)
+            return attr
 
         def read_y(self):
-            self.y_attr = self.device.read_attribute(self.name)
+            self.y_attr = self.read_attribute(self.name)
             self.y = self.y_attr.value
             return self.y
 
@@ -45,7 +91,7 @@ class PrototypeDumperDevice:
                 self.x = None
                 return self.x
             try:
-                self.x_attr = self.device.read_attribute(x_name)
+                self.x_attr = self.read_attribute(x_name)
                 self.x = self.x_attr.value
                 return self.x
             except:
@@ -58,8 +104,7 @@ class PrototypeDumperDevice:
             if self.properties is not None and not force:
                 return self.properties
             try:
-                db = self.device.get_device_db()
-                self.properties = db.get_device_attribute_property(self.device.name(), self.name)[self.name]
+                self.properties = PropertyCache.get(self.device, self.name)
             except:
                 self.properties = {}
             return self.properties
@@ -73,6 +118,11 @@ class PrototypeDumperDevice:
 
         def marks(self):
             properties = self.read_properties()
+            key = tuple((p_key, tuple(properties[p_key])) for p_key in properties
+                        if p_key.endswith("_start") or p_key.endswith("_length"))
+            cached = self.mark_cache.get('marks')
+            if cached is not None and cached[0] == key:
+                return cached[1]
             result = {}
             for p_key in properties:
                 if p_key.endswith("_start"):
@@ -85,22 +135,28 @@ class PrototypeDumperDevice:
                             result[mark_name] = (pv, pv + pl)
                     except:
                         pass
+            self.mark_cache['marks'] = (key, result)
             return result
 
-        def mark_values(self):
-            result = {}
+        def mark_ranges(self):
+            # index ranges of marks on x, reused while marks and x are unchanged
             mrk = self.marks()
-            for key in mrk:
-                try:
-                    range = mrk[key]
-                    index = numpy.logical_and(self.x >= range[0], self.x <= range[1])
-                    if numpy.any(index):
-                        result[key] = self.y[index].mean()
-                    else:
-                        result[key] = float('nan')
-                except:
-                    pass
-            return result
+            cached = self.mark_cache.get('ranges')
+            if cached is not None and cached[0] is mrk:
+                x = cached[1]
+                if x is self.x or (len(x) == len(self.x) and numpy.array_equal(x, self.x)):
+                    return cached[2]
+            ranges = mark_ranges(self.x, mrk)
+            self.mark_cache['ranges'] = (mrk, self.x, ranges)
+            return ranges
+
+        def mark_values(self):
+            try:
+                if len(self.x) != len(self.y):
+                    return {}
+                return mark_means(numpy.asarray(self.y), self.mark_ranges())
+            except:
+                return {}
 
         def save_log(self, log_file: IO, additional_marks=None):
             if additional_marks is None:
@@ -165,102 +221,147 @@ class PrototypeDumperDevice:
                 print('    ', label, '---- no marks')
             self.logger.debug('%s Log Saved', self.file_name)
 
-        def save_properties(self, zip_file: zipfile.ZipFile, folder: str = ''):
+        def save_properties(self, zip_file: zipfile.ZipFile, folder: str = '', uniform=None):
+            # uniform - uniform_x() result, x0, dx, x_last are written for x not saved by save_data
             if not folder.endswith('/'):
                 folder += '/'
             zip_entry = folder + "param" + self.file_name + ".txt"
-            buf = "Signal_Name=%s/%s\r\n" % (self.device.name(), self.name)
+            device_name = self.device_name if self.device is None else self.device.name()
+            buf = "Signal_Name=%s/%s\r\n" % (device_name, self.name)
             properties = self.read_properties()
             for prop in properties:
                 buf += '%s=%s\r\n' % (prop, properties[prop][0])
+            if uniform is not None:
+                buf += 'x0=%r\r\ndx=%r\r\nx_last=%r\r\n' % uniform
             zip_file.writestr(zip_entry, buf)
             self.logger.debug('%s Properties saved to %s', self.file_name, zip_entry)
             return True
 
-        def save_data(self, zip_file: zipfile.ZipFile, folder: str = ''):
+        def uniform_x(self, avg: int = None):
+            # (x0, dx, x_last) if x may be saved as properties instead of data column, else None.
+            # avg None - save_avg property
+            if self.uniform_x_tolerance <= 0.0 or self.x is None or numpy.ndim(self.y) == 0:
+                return None
+            if avg is None:
+                avg = int(self.read_properties().get("save_avg", ['1'])[0])
+            return uniform_x(self.x[:numpy.size(self.y)], avg, self.uniform_x_tolerance)
+
+        def save_data(self, zip_file: zipfile.ZipFile, folder: str = '', save_format: str = 'txt', uniform=None):
+            # uniform - uniform_x() result written by save_properties, x column is omitted if not None
             if self.y is None:
                 self.logger.debug('%s No data to save', self.file_name)
                 return
             if not folder.endswith('/'):
                 folder += '/'
-            zip_entry = folder + self.file_name + ".txt"
             avg = int(self.read_properties().get("save_avg", ['1'])[0])
-            # save_as_numpy = self.properties.get('save_numpy',['0'])[0] == '1'
-            outbuf = ''
-            t0 = time.time()
-            if self.x is None:
-                # save only y values
-                fmt = '%f'
-                fmtcrlf = fmt + '\r\n'
-                try:
-                    n = len(self.y)
-                    ys = 0.0
-                    ns = 0.0
-                    for k in range(n - 2):
-                        ys += self.y[k]
-                        ns += 1.0
-                        if ns >= avg:
-                            s = fmtcrlf % (ys / ns)
-                            outbuf += s.replace(",", ".")
-                            ys = 0.0
-                            ns = 0.0
-                    ys += self.y[n - 1]
-                    ns += 1.0
-                    s = fmt % (ys / ns)
-                    outbuf += s.replace(",", ".")
-                except:
-                    s = fmt % self.y
-                    outbuf += s.replace(",", ".")
+            # channel property overrides device save format
+            save_format = self.properties.get("save_format", [save_format])[0].lower()
+            if save_format not in SAVE_FORMATS:
+                self.logger.warning('%s Unknown save format %s, txt is used', self.file_name, save_format)
+                save_format = 'txt'
+            zip_entry = folder + self.file_name + "." + save_format
+            y = self.y
+            x = self.x
+            if uniform is not None and x is not None:
+                # x is saved by save_properties
+                y = y[:numpy.size(x)]
+                x = None
+            if 0 < self.stream_points <= numpy.size(y):
+                # long channels are formatted chunk by chunk while zip entry is written
+                chunks = channel_chunks(y, x, avg, save_format)
+                if hasattr(zip_file, 'writestream'):
+                    zip_file.writestream(zip_entry, chunks)
+                else:
+                    write_stream(zip_file, zip_entry, chunks)
+                self.logger.debug('%s Data streamed to %s', self.file_name, zip_entry)
+                return
+            if save_format == 'txt':
+                outbuf = channel_text(y, x, avg)
             else:
-                # save "x; y" pairs
-                fmt = '%f; %f'
-                fmtcrlf = fmt + '\r\n'
-                n = min(len(self.x), len(self.y))
-                # r = int(n % avg)
-                # d = int(n / avg)
-                # avg = int(avg)
-                # ynps = self.y[:n-r].reshape((d, avg)).mean(1)
-                # xnps = self.x[:n-r].reshape((d, avg)).mean(1)
-                # z = numpy.vstack((xnps, ynps)).T
-                xs = 0.0
-                ys = 0.0
-                ns = 0.0
-                for k in range(n - 2):
-                    xs += self.x[k]
-                    ys += self.y[k]
-                    ns += 1.0
-                    if ns >= avg:
-                        s = fmtcrlf % (xs / ns, ys / ns)
-                        outbuf += s.replace(",", ".")
-                        xs = 0.0
-                        ys = 0.0
-                        ns = 0.0
-                xs += self.x[n - 1]
-                ys += self.y[n - 1]
-                ns += 1.0
-                s = fmt % (xs / ns, ys / ns)
-                outbuf += s.replace(",", ".")
-            # self.logger.debug('dT = %s', time.time() - t0)
+                outbuf = channel_bytes(y, x, avg, save_format)
             zip_file.writestr(zip_entry, outbuf)
-            # self.logger.debug('dT = %s', time.time() - t0)
-            # zip_file.writestr(zip_entry.replace('.txt', '.npy'), z.tobytes())
-            # self.logger.debug('dT = %s', time.time() - t0)
             self.logger.debug('%s Data saved to %s', self.file_name, zip_entry)
 
-    def __init__(self, device_name: str, reactivate_if_not_defined: bool = True):
+    def __init__(self, device_name: str, reactivate_if_not_defined: bool = True, save_format: str = 'txt',
+                 compression: str = None):
         self.logger = config_logger()
         self.name = device_name
+        self.save_format = save_format
+        # zip compression codec for item entries, 'stored', 'deflate:N', 'bzip2:N', 'lzma', None - dumper default
+        self.compression = compression
+        # Channel settings of dumper owning the item, applied to channels when they are encoded
+        self.channel_settings = {}
         self.active = False
         self.device = None
         self.time = 0.0
         self.activation_timeout = 10.0
         self.defined_in_db = True
         self.reactivate_if_not_defined = reactivate_if_not_defined
+        # threading.Event set by change event callback to wake up dumper main loop
+        self.shot_event = None
+        self.event_id = None
+        self.event_value = None
+        self.event_error = True
+        # attribute values read in advance by dumper, name -> DeviceAttribute
+        self.prefetched = {}
         self.activate()
 
     def new_shot(self):
         return False
 
+    def attribute_names(self):
+        # names of device attributes read by item every shot
+        return []
+
+    def read_attributes(self, names):
+        # read attributes by one call, returns dictionary of successfully read values
+        result = {}
+        for name, attr in zip(names, self.device.read_attributes(names)):
+            if not attr.has_failed:
+                result[name] = attr
+        return result
+
+    def subscribe_change_event(self, attribute_name: str):
+        # subscribe to CHANGE_EVENT of attribute, returns False if events are not available
+        if self.event_id is not None:
+            return True
+        try:
+            self.event_error = False
+            self.event_id = self.device.subscribe_event(attribute_name, tango.EventType.CHANGE_EVENT,
+                                                        self.change_event_callback)
+            self.logger.debug('%s subscribed to change event of %s', self.name, attribute_name)
+            return True
+        except:
+            self.event_id = None
+            self.event_error = True
+            self.logger.info('%s change event of %s is not available, polling is used', self.name, attribute_name)
+            self.logger.debug('', exc_info=True)
+            return False
+
+    def release(self):
+        # unsubscribe change event, called by dumper for removed items
+        if self.event_id is None:
+            return
+        try:
+            self.device.unsubscribe_event(self.event_id)
+            self.logger.debug('%s unsubscribed from change event', self.name)
+        except:
+            log_exception(self, "%s unsubscribe error", self.name, level=logging.WARNING)
+        self.event_id = None
+        self.event_value = None
+        self.event_error = True
+
+    def change_event_callback(self, event):
+        if event.err:
+            # events are not delivered, switch to polling until next good event
+            self.event_error = True
+            self.logger.debug('%s change event error %s', self.name, event.errors)
+            return
+        self.event_value = event.attr_value.value
+        self.event_error = False
+        if self.shot_event is not None:
+            self.shot_event.set()
+
     def activate(self):
         if self.active:
             return True
@@ -269,11 +370,16 @@ class PrototypeDumperDevice:
         self.time = time.time()
         if self.reactivate_if_not_defined or self.defined_in_db:
             try:
-                self.device = tango.DeviceProxy(self.name)
+                self.device = DeviceProxyPool.get(self.name)
                 self.active = True
                 self.defined_in_db = True
                 self.logger.debug("%s has been activated", self.name)
                 return True
+            except ProxyBackOff as ex:
+                # creation error was reported by first attempt
+                self.device = None
+                self.active = False
+                self.logger.debug('%s', ex)
             except DevFailed:
                 self.device = None
                 self.active = False
@@ -289,11 +395,17 @@ class PrototypeDumperDevice:
                 log_exception("%s activation error: ", self.name)
         return False
 
+    def acquire(self, folder: str = None):
+        # acquisition stage, returns ShotRecord with data read from device.
+        # Items implementing only save() are recorded through in-memory log and zip
+        if type(self).save is PrototypeDumperDevice.save:
+            raise NotImplementedError()
+        record = ShotRecord(self.name, self.save_format)
+        self.save(record, record, folder)
+        return record
+
     def save(self, log_file: IO, zip_file: zipfile.ZipFile, folder: str = None):
-        raise NotImplemented()
-        # if not self.active:
-        #     self.logger.debug('Reading inactive device')
-        #     return
+        self.acquire(folder).flush(log_file, zip_file)
 
     def property(self, prop_name: str):
         try:
@@ -313,9 +425,9 @@ class PrototypeDumperDevice:
     @staticmethod
     def as_boolean(value):
         value = str(value)
-        if value.lower() in PrototypeDumperDevice.TRUE_VALUES:
+        if value.lower() in TRUE_VALUES:
             return True
-        if value.lower() in PrototypeDumperDevice.FALSE_VALUES:
+        if value.lower() in FALSE_VALUES:
             return False
         return None
 
@@ -0,0 +1,96 @@
+import zipfile
+
+from ShotDedup import REF_SUFFIX
+from ZipCompressor import write_compressed, write_stream
+
+
+class ShotBuffer:
+    # in-memory stand-in for log and zip files used while a dumper item is saved,
+    # collected output is written to the real files later in configured order
+    def __init__(self, name: str = ''):
+        self.name = name
+        # ordered list of ('log', str), ('zip', (zinfo_or_arcname, data, compress_type, compresslevel)),
+        # ('stream', (zinfo_or_arcname, iterable of bytes chunks, compress_type, compresslevel))
+        # and ('compressed', Future of (zinfo, compressed data))
+        self.parts = []
+        # read retries during acquisition
+        self.retries = 0
+
+    def __str__(self):
+        return self.name
+
+    # log file part
+    def write(self, s: str):
+        self.parts.append(('log', s))
+        return len(s)
+
+    # zip file part
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        self.parts.append(('zip', (zinfo_or_arcname, data, compress_type, compresslevel)))
+
+    # zip entry produced while it is written
+    def writestream(self, zinfo_or_arcname, chunks, compress_type=None, compresslevel=None):
+        self.parts.append(('stream', (zinfo_or_arcname, chunks, compress_type, compresslevel)))
+
+    def namelist(self):
+        return [self.entry_name(value[0]) for kind, value in self.parts if kind in ('zip', 'stream')]
+
+    def set_compression(self, compress_type, compresslevel=None):
+        # compression for zip entries written without explicit compress_type
+        if compress_type is None:
+            return
+        parts = []
+        for kind, value in self.parts:
+            if kind in ('zip', 'stream') and value[2] is None:
+                value = (value[0], value[1], compress_type, compresslevel)
+            parts.append((kind, value))
+        self.parts = parts
+
+    def compress(self, compressor):
+        # start compression of zip entries in ZipCompressor pool,
+        # entries are compressed while written if pool results can not be written
+        if not compressor.parallel:
+            return
+        self.parts = [('compressed', compressor.submit(*value)) if kind in ('zip', 'stream') else (kind, value)
+                      for kind, value in self.parts]
+
+    def getinfo(self, name: str):
+        if name not in self.namelist():
+            raise KeyError('There is no item named %r in the buffer' % name)
+        return zipfile.ZipInfo(name)
+
+    def size(self):
+        # total size of zip entries data, bytes, streamed entries are not counted
+        n = 0
+        for kind, value in self.parts:
+            if kind == 'zip':
+                n += len(value[1])
+        return n
+
+    @staticmethod
+    def entry_name(zinfo_or_arcname):
+        if isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            return zinfo_or_arcname.filename
+        return zinfo_or_arcname
+
+    def flush(self, log_file, zip_file: zipfile.ZipFile, dedup=None):
+        # dedup - ShotDedup, entries unchanged since previous shots are written as references
+        for kind, value in self.parts:
+            if kind == 'log':
+                log_file.write(value)
+            elif kind == 'zip':
+                ref = None if dedup is None else dedup.check(self.entry_name(value[0]), value[1])
+                if ref is None:
+                    zip_file.writestr(*value)
+                else:
+                    zip_file.writestr(self.entry_name(value[0]) + REF_SUFFIX, ref, zipfile.ZIP_STORED)
+            elif kind == 'stream':
+                write_stream(zip_file, *value)
+            elif kind == 'compressed':
+                zinfo, compressed = value.result()
+                ref = None if dedup is None else dedup.check(zinfo.filename, compressed)
+                if ref is None:
+                    write_compressed(zip_file, zinfo, compressed)
+                else:
+                    zip_file.writestr(zinfo.filename + REF_SUFFIX, ref, zipfile.ZIP_STORED)
+        self.parts = []
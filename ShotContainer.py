@@ -0,0 +1,177 @@
+"""
+Append-only container of shot zip files, one container per day.
+Records are appended as header + complete shot zip and flushed to disk
+before the offset index row is written, so an interrupted append is
+detected and removed when the writer opens the container again.
+Readers use index rows only and never modify the files
+"""
+import io
+import os
+import struct
+import zipfile
+import zlib
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# record header: magic, shot number, time, zip length, zip crc32
+RECORD_MAGIC = b'TSDS'
+RECORD_HEADER = struct.Struct('<4sqdQI')
+# index row: shot number, time, zip offset, zip length
+INDEX_ROW = struct.Struct('<qdQQ')
+CONTAINER_EXTENSION = '.shots'
+INDEX_EXTENSION = '.idx'
+LOCK_EXTENSION = '.lock'
+
+
+class ShotContainer:
+    # mode 'r' - reader of shots indexed so far,
+    # mode 'a' - the only writer, holds exclusive lock until close()
+    def __init__(self, file_name: str, mode: str = 'r'):
+        if mode not in ('r', 'a'):
+            raise ValueError("ShotContainer mode must be 'r' or 'a'")
+        self.file_name = file_name
+        self.index_file_name = os.path.splitext(file_name)[0] + INDEX_EXTENSION
+        self.mode = mode
+        self.rows = []
+        # container size after last complete record, writer only
+        self.size = 0
+        self.lock_file = None
+        if mode == 'a':
+            self.lock()
+            try:
+                self.recover()
+            except:
+                self.close()
+                raise
+        else:
+            self.rows = self.read_rows()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def lock(self):
+        self.lock_file = open(os.path.splitext(self.file_name)[0] + LOCK_EXTENSION, 'a+b')
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            self.lock_file.close()
+            self.lock_file = None
+            raise RuntimeError('%s is opened by another writer' % self.file_name)
+
+    def close(self):
+        # release writer lock
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def read_index(self):
+        rows = []
+        if os.path.exists(self.index_file_name):
+            with open(self.index_file_name, 'rb') as f:
+                data = f.read()
+            n = len(data) // INDEX_ROW.size
+            rows = [INDEX_ROW.unpack_from(data, i * INDEX_ROW.size) for i in range(n)]
+        return rows
+
+    def read_rows(self):
+        # index rows of records within container, data past the last indexed record are ignored
+        size = os.path.getsize(self.file_name) if os.path.exists(self.file_name) else 0
+        return [row for row in self.read_index() if row[2] + row[3] <= size]
+
+    def recover(self):
+        # check index against container, index records missing in index and cut incomplete tail.
+        # Called by writer under its lock, index is rewritten only if it does not match container
+        index_rows = self.read_index()
+        rows = list(index_rows)
+        size = os.path.getsize(self.file_name) if os.path.exists(self.file_name) else 0
+        while len(rows) > 0 and rows[-1][2] + rows[-1][3] > size:
+            rows.pop()
+        position = rows[-1][2] + rows[-1][3] if len(rows) > 0 else 0
+        if position < size:
+            with open(self.file_name, 'rb') as f:
+                while position + RECORD_HEADER.size <= size:
+                    f.seek(position)
+                    magic, shot, t, length, crc = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                    offset = position + RECORD_HEADER.size
+                    if magic != RECORD_MAGIC or length <= 0 or offset + length > size:
+                        break
+                    if zlib.crc32(f.read(length)) != crc:
+                        break
+                    rows.append((shot, t, offset, length))
+                    position = offset + length
+        if position < size:
+            # interrupted append
+            with open(self.file_name, 'r+b') as f:
+                f.truncate(position)
+        index_size = os.path.getsize(self.index_file_name) if os.path.exists(self.index_file_name) else 0
+        if rows != index_rows or index_size != len(rows) * INDEX_ROW.size:
+            with open(self.index_file_name, 'wb') as f:
+                f.write(b''.join([INDEX_ROW.pack(*row) for row in rows]))
+        self.rows = rows
+        self.size = position
+        return rows
+
+    def next_offset(self):
+        # offset of shot zip appended next
+        return self.size + RECORD_HEADER.size
+
+    def append(self, shot: int, t: float, data: bytes):
+        # append shot zip and one index row, returns its offset in container
+        if self.lock_file is None:
+            raise ValueError('%s is not opened for writing' % self.file_name)
+        with open(self.file_name, 'ab') as f:
+            position = f.tell()
+            f.write(RECORD_HEADER.pack(RECORD_MAGIC, shot, t, len(data), zlib.crc32(data)))
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self.size = f.tell()
+        row = (shot, t, position + RECORD_HEADER.size, len(data))
+        with open(self.index_file_name, 'ab') as f:
+            f.write(INDEX_ROW.pack(*row))
+        self.rows.append(row)
+        return row[2]
+
+    def shots(self):
+        return [row[0] for row in self.rows]
+
+    def find(self, shot: int, offset: int = None):
+        # index row of shot record at offset, offset None - last record of shot number
+        for row in reversed(self.rows):
+            if row[0] == shot and (offset is None or row[2] == offset):
+                return row
+        if offset is None:
+            raise KeyError('Shot %s is not in %s' % (shot, self.file_name))
+        raise KeyError('Shot %s at %d is not in %s' % (shot, offset, self.file_name))
+
+    def read(self, shot: int, offset: int = None):
+        # shot zip data
+        row = self.find(shot, offset)
+        with open(self.file_name, 'rb') as f:
+            f.seek(row[2])
+            return f.read(row[3])
+
+    def open(self, shot: int, offset: int = None):
+        return zipfile.ZipFile(io.BytesIO(self.read(shot, offset)), 'r')
+
+    def entries(self, shot: int, offset: int = None):
+        with self.open(shot, offset) as zip_file:
+            return zip_file.namelist()
+
+    def reader(self, shot: int, offset: int = None):
+        # ShotReader of shot, stored binary channels are mapped from container file
+        from ShotReader import ShotReader
+        row = self.find(shot, offset)
+        return ShotReader(self.file_name, offset=row[2], length=row[3])
@@ -0,0 +1,92 @@
+"""
+Deduplication of zip entries unchanged since previous shots.
+Unchanged entry is written as "<entry>.ref" text naming the zip file
+(or ShotContainer shot "file#shot@offset") holding its data
+"""
+import hashlib
+import os
+import zipfile
+
+REF_SUFFIX = '.ref'
+
+
+def ref_text(location: str, digest: str):
+    return 'file=%s\r\nsha1=%s\r\n' % (location, digest)
+
+
+def parse_ref(text):
+    if isinstance(text, bytes):
+        text = text.decode(errors='replace')
+    ref = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition('=')
+        if sep:
+            ref[key.strip()] = value.strip()
+    return ref
+
+
+def open_location(location: str):
+    # zip file of location "file.zip", "file.shots#shot" or "file.shots#shot@offset",
+    # container is opened read only, offset selects the record if shot numbers repeat in container
+    file_name, _, shot = location.partition('#')
+    if shot:
+        from ShotContainer import ShotContainer
+        shot, _, offset = shot.partition('@')
+        return ShotContainer(file_name).open(int(shot), int(offset) if offset else None)
+    return zipfile.ZipFile(file_name, 'r')
+
+
+def read_entry(zip_file, entry: str, folder: str = None):
+    # data of zip entry, references to previous shots are resolved.
+    # folder of zip file is used for relative references, default - folder of zip_file.filename
+    try:
+        return zip_file.read(entry)
+    except KeyError:
+        if entry + REF_SUFFIX not in zip_file.namelist():
+            raise
+    ref = parse_ref(zip_file.read(entry + REF_SUFFIX))
+    if folder is None:
+        folder = os.path.dirname(zip_file.filename or '')
+    with open_location(os.path.join(folder, ref['file'])) as ref_zip:
+        return ref_zip.read(entry)
+
+
+class ShotDedup:
+    def __init__(self):
+        # entry name -> (digest, location of zip file with entry data)
+        self.entries = {}
+        # entries written with data in current shot
+        self.pending = {}
+        self.location = None
+        self.folder = None
+
+    def begin(self, location: str):
+        # start of shot written to location, references are kept within one folder (day)
+        folder = os.path.dirname(location)
+        if folder != self.folder:
+            self.entries = {}
+            self.folder = folder
+        self.location = location
+        self.pending = {}
+
+    def commit(self):
+        # shot is written, its entries may be referenced by next shots
+        self.entries.update(self.pending)
+        self.pending = {}
+
+    def check(self, name: str, data):
+        # reference text if data is equal to last written entry name, else None.
+        # data of entries compressed in ZipCompressor pool is compared after compression
+        if self.location is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode()
+        digest = hashlib.sha1(data).hexdigest()
+        last = self.entries.get(name)
+        # entry of the same location is never referenced, e.g. zip file written again
+        if last is not None and last[0] == digest and last[1] != self.location:
+            text = ref_text(os.path.relpath(last[1], self.folder).replace(os.sep, '/'), digest)
+            if len(text) < len(data):
+                return text
+        self.pending[name] = (digest, self.location)
+        return None
@@ -10,6 +10,8 @@ import zipfile
 import numpy
 import tango
 
+from DataEncoder import average, format_lines
+
 
 def config_logger(name: str=__name__, level: int=logging.DEBUG):
     logger = logging.getLogger(name)
@@ -41,17 +43,10 @@ def print_exception_info(level=logging.DEBUG):
 
 
 def convert_to_buf(x, y, avgc, fmt='%f; %f'):
-        xs = 0.0
-        ys = 0.0
-        ns = 0.0
-        fmt = fmt
-        s = ''
-        outbuf = ''
-
         if y is None or x is None:
-            return outbuf
+            return ''
         if len(y) <= 0 or len(x) <= 0:
-            return outbuf
+            return ''
         n = len(y)
         if len(y) != len(x):
             if len(x) < n:
@@ -61,25 +56,10 @@ def convert_to_buf(x, y, avgc, fmt='%f; %f'):
         if avgc < 1:
             avgc = 1
 
-        for i in range(n):
-            xs += x[i]
-            ys += y[i]
-            ns += 1.0
-            if ns >= avgc:
-                if i >= avgc:
-                    outbuf += '\r\n'
-                s = fmt % (xs / ns, ys / ns)
-                outbuf += s.replace(",", ".")
-                xs = 0.0
-                ys = 0.0
-                ns = 0.0
-        if ns > 0:
-            outbuf += '\r\n'
-            s = fmt % (xs / ns, ys / ns)
-            outbuf += s.replace(",", ".")
-            xs = 0.0
-            ys = 0.0
-            ns = 0.0
+        outbuf = format_lines(fmt, average(x[:n], avgc), average(y[:n], avgc))
+        # partial block is always preceded by line break
+        if n < avgc:
+            outbuf = '\r\n' + outbuf
         return outbuf
 
 
@@ -517,35 +497,17 @@ class TangoAttribute:
         return False
 
     def convert_to_buf(self, avgc, y=None, x=None):
-        outbuf = ''
         if avgc < 1:
             avgc = 1
 
         if x is None:
             # save only y values
-            fmt = '%f'
             if y is None:
                 y = self.attr.value
             n = len(y)
-            ys = 0.0
-            ns = 0.0
-            for k in range(n):
-                ys += y[k]
-                ns += 1.0
-                if ns >= avgc:
-                    if k >= avgc:
-                        outbuf += '\r\n'
-                    s = fmt % (ys / ns)
-                    outbuf += s.replace(",", ".")
-                    ys = 0.0
-                    ns = 0.0
-            if ns > 0:
-                outbuf += '\r\n'
-                s = fmt % (ys / ns)
-                outbuf += s.replace(",", ".")
+            outbuf = format_lines('%f', average(y, avgc))
         else:
             # save "x; y" pairs
-            fmt = '%f; %f'
             if y is None:
                 y = self.attr.value
             if y is None:
@@ -556,25 +518,10 @@ class TangoAttribute:
             if len(x) < n:
                 n = len(x)
                 LOGGER.log(logging.WARNING, "X and Y arrays of different length, truncated to %d" % n)
-            xs = 0.0
-            ys = 0.0
-            ns = 0.0
-            for k in range(n):
-                xs += x[k]
-                ys += y[k]
-                ns += 1.0
-                if ns >= avgc:
-                    if k >= avgc:
-                        outbuf += '\r\n'
-                    s = fmt % (xs / ns, ys / ns)
-                    outbuf += s.replace(",", ".")
-                    xs = 0.0
-                    ys = 0.0
-                    ns = 0.0
-            if ns > 0:
-                outbuf += '\r\n'
-                s = fmt % (xs / ns, ys / ns)
-                outbuf += s.replace(",", ".")
+            outbuf = format_lines('%f; %f', average(x[:n], avgc), average(y[:n], avgc))
+        # partial block is always preceded by line break
+        if 0 < n < avgc:
+            outbuf = '\r\n' + outbuf
         return outbuf
 
     def get_marks(self):
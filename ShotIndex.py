@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SQLite index of shots written by shot dumpers: one row per shot with all logged marks
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS shots (id INTEGER PRIMARY KEY, shot INTEGER, time REAL, date TEXT, "
+    "zip TEXT, log TEXT, UNIQUE(log, date, shot))",
+    "CREATE TABLE IF NOT EXISTS marks (shot_id INTEGER, name TEXT, value REAL, unit TEXT)",
+    "CREATE INDEX IF NOT EXISTS shots_shot ON shots(shot)",
+    "CREATE INDEX IF NOT EXISTS shots_time ON shots(time)",
+    "CREATE INDEX IF NOT EXISTS marks_name_value ON marks(name, value)",
+    "CREATE INDEX IF NOT EXISTS marks_shot_id ON marks(shot_id)",
+)
+
+
+class ShotIndex:
+    def __init__(self, file_name: str = 'shots.db', root: str = '.'):
+        self.file_name = file_name
+        # out_root_dir of dumper, paths in index are relative to it
+        self.root = root
+
+    def connect(self):
+        connection = sqlite3.connect(self.file_name, timeout=30.0)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    @staticmethod
+    def parse_line(line: str):
+        # shot log line "date; Shot=n; Shot_time=t; name = value unit; ...; File=zip"
+        parts = line.rstrip('\r\n').split('; ')
+        result = {'date': parts[0].strip(), 'shot': None, 'time': None, 'file': None, 'marks': []}
+        for part in parts[1:]:
+            key, sep, value = part.partition('=')
+            if not sep:
+                continue
+            key = key.strip()
+            value = value.strip()
+            try:
+                if key == 'Shot':
+                    result['shot'] = int(value)
+                    continue
+                if key == 'Shot_time':
+                    result['time'] = float(value)
+                    continue
+            except ValueError:
+                continue
+            if key == 'File':
+                result['file'] = value
+                continue
+            number, _, unit = value.partition(' ')
+            try:
+                number = float(number)
+            except ValueError:
+                number = float('nan')
+            result['marks'].append((key, number, unit.strip()))
+        return result
+
+    def relative(self, path: str):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def add_line(self, connection, line: str, log_file_name: str):
+        # add shot from log line, returns False for lines already indexed or not shot lines
+        shot = self.parse_line(line)
+        if shot['shot'] is None:
+            return False
+        zip_name = None
+        if shot['file'] is not None:
+            zip_name = self.relative(os.path.join(os.path.dirname(log_file_name), shot['file']))
+        cursor = connection.execute("INSERT OR IGNORE INTO shots (shot, time, date, zip, log) VALUES (?, ?, ?, ?, ?)",
+                                    (shot['shot'], shot['time'], shot['date'], zip_name,
+                                     self.relative(log_file_name)))
+        if cursor.rowcount <= 0:
+            return False
+        shot_id = cursor.lastrowid
+        connection.executemany("INSERT INTO marks (shot_id, name, value, unit) VALUES (?, ?, ?, ?)",
+                               [(shot_id, name, value, unit) for name, value, unit in shot['marks']])
+        return True
+
+    @staticmethod
+    def last_line(file_name: str, block: int = 65536):
+        # last non empty line of log file without reading whole file
+        with open(file_name, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            data = b''
+            position = size
+            while position > 0:
+                n = min(block, position)
+                position -= n
+                f.seek(position)
+                data = f.read(n) + data
+                lines = data.rstrip(b'\r\n').rsplit(b'\n', 1)
+                if len(lines) > 1 or position == 0:
+                    return lines[-1].decode(errors='replace')
+        return ''
+
+    def add_last_shot(self, log_file_name: str):
+        # index shot written last to log file
+        line = self.last_line(log_file_name)
+        with contextlib.closing(self.connect()) as connection, connection:
+            return self.add_line(connection, line, log_file_name)
+
+    def backfill(self, root: str = None):
+        # index all shots from log files under root, returns number of added shots
+        if root is None:
+            root = self.root
+        n = 0
+        with contextlib.closing(self.connect()) as connection, connection:
+            for folder, dirs, files in os.walk(root):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if not file_name.endswith('.log'):
+                        continue
+                    log_file_name = os.path.join(folder, file_name)
+                    with open(log_file_name, 'r', errors='replace') as log_file:
+                        for line in log_file:
+                            if self.add_line(connection, line, log_file_name):
+                                n += 1
+                    connection.commit()
+        return n
+
+    def find(self, name: str, min_value: float = None, max_value: float = None):
+        # shots with mark name in [min_value, max_value], list of (shot, time, zip, value),
+        # zip of container records is "file.shots#shot@offset", see ShotDedup.open_location
+        query = "SELECT shots.shot, shots.time, shots.zip, marks.value FROM marks " \
+                "JOIN shots ON shots.id = marks.shot_id WHERE marks.name = ?"
+        args = [name]
+        if min_value is not None:
+            query += " AND marks.value >= ?"
+            args.append(min_value)
+        if max_value is not None:
+            query += " AND marks.value <= ?"
+            args.append(max_value)
+        query += " ORDER BY shots.time"
+        with contextlib.closing(self.connect()) as connection, connection:
+            return connection.execute(query, args).fetchall()
+
+    def marks(self, shot: int):
+        # marks of shot number, name -> (value, unit)
+        with contextlib.closing(self.connect()) as connection, connection:
+            rows = connection.execute("SELECT marks.name, marks.value, marks.unit FROM marks "
+                                      "JOIN shots ON shots.id = marks.shot_id WHERE shots.shot = ?",
+                                      (shot,)).fetchall()
+        return {name: (value, unit) for name, value, unit in rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Shot index database')
+    parser.add_argument('root', help='dumper out_root_dir')
+    parser.add_argument('--db', default=None, help='index file, default root/shots.db')
+    parser.add_argument('--backfill', action='store_true', help='index all log files under root')
+    parser.add_argument('--find', default=None, help='mark name to search')
+    parser.add_argument('--min', type=float, default=None)
+    parser.add_argument('--max', type=float, default=None)
+    arguments = parser.parse_args()
+    index = ShotIndex(arguments.db or os.path.join(arguments.root, 'shots.db'), arguments.root)
+    if arguments.backfill:
+        print('%d shots added' % index.backfill())
+    if arguments.find is not None:
+        for row in index.find(arguments.find, arguments.min, arguments.max):
+            print('%d; %s; %s; %s' % row)
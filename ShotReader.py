@@ -0,0 +1,176 @@
+"""
+Reader of shot zip files written by shot dumpers.
+Channels are decoded on first access; stored binary entries are returned
+as read-only numpy views of the memory mapped zip file
+"""
+import io
+import mmap
+import os
+import struct
+import zipfile
+
+import numpy
+
+from DataEncoder import SAVE_FORMATS, F32_HEADER, F32_MAGIC, decode, read_params, restore_x
+from ShotDedup import REF_SUFFIX, read_entry
+
+# zip local file header: signature ... file name length, extra field length
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+
+
+class ShotChannel:
+    # one channel of shot, data and properties are read on first access
+    def __init__(self, reader, entry: str):
+        self.reader = reader
+        self.entry = entry
+        self.folder, _, file_name = entry.rpartition('/')
+        self.name, _, self.save_format = file_name.rpartition('.')
+        self._params = None
+        self._data = None
+
+    def __repr__(self):
+        return 'ShotChannel(%s)' % self.entry
+
+    @property
+    def params(self):
+        if self._params is None:
+            self._params = self.reader.params(self.entry)
+        return self._params
+
+    def load(self):
+        if self._data is None:
+            x, y = self.reader.decode(self.entry)
+            if x is None and len(y) > 0 and 'dx' in self.params:
+                x = restore_x(len(y), float(self.params['x0']), float(self.params['dx']),
+                              float(self.params['x_last']))
+            self._data = (x, y)
+        return self._data
+
+    @property
+    def x(self):
+        return self.load()[0]
+
+    @property
+    def y(self):
+        return self.load()[1]
+
+    def unload(self):
+        self._data = None
+
+
+class ShotReader:
+    def __init__(self, file_name: str, use_mmap: bool = True, offset: int = 0, length: int = None):
+        # offset and length select shot zip inside ShotContainer file
+        self.file_name = file_name
+        # references to previous shots are relative to folder of file
+        self.folder = os.path.dirname(file_name)
+        self.offset = offset
+        if length is None:
+            self.zip_file = zipfile.ZipFile(file_name, 'r')
+        else:
+            with open(file_name, 'rb') as f:
+                f.seek(offset)
+                self.zip_file = zipfile.ZipFile(io.BytesIO(f.read(length)), 'r')
+        self.use_mmap = use_mmap
+        self._file = None
+        self._mmap = None
+        self._channels = {}
+        for name in self.zip_file.namelist():
+            if name.endswith(REF_SUFFIX):
+                name = name[:-len(REF_SUFFIX)]
+            file_name = name.rpartition('/')[2]
+            if file_name.startswith('param') or file_name.rpartition('.')[2] not in SAVE_FORMATS:
+                continue
+            channel = ShotChannel(self, name)
+            self._channels[channel.folder + '/' + channel.name if channel.folder else channel.name] = channel
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getitem__(self, name: str):
+        return self._channels[name]
+
+    def __contains__(self, name: str):
+        return name in self._channels
+
+    def __iter__(self):
+        return iter(self._channels.values())
+
+    def __len__(self):
+        return len(self._channels)
+
+    def folders(self):
+        # device folders of shot in order of appearance
+        result = []
+        for channel in self._channels.values():
+            if channel.folder not in result:
+                result.append(channel.folder)
+        return result
+
+    def channels(self, folder: str = None):
+        # channel keys 'folder/name', all or of one folder
+        return [key for key, channel in self._channels.items() if folder is None or channel.folder == folder]
+
+    def params(self, entry: str):
+        # properties saved with channel entry, name -> str value
+        return read_params(self.zip_file, entry, self.folder)
+
+    def buffer(self, entry: str):
+        # zero copy view of stored entry data, None for compressed and referenced entries
+        try:
+            info = self.zip_file.getinfo(entry)
+        except KeyError:
+            return None
+        if not self.use_mmap or info.compress_type != zipfile.ZIP_STORED or info.file_size <= 0:
+            return None
+        if self._mmap is None:
+            self._file = open(self.file_name, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_offset = self.offset + info.header_offset
+        header = LOCAL_HEADER.unpack_from(self._mmap, header_offset)
+        offset = header_offset + LOCAL_HEADER.size + header[10] + header[11]
+        return memoryview(self._mmap)[offset:offset + info.file_size]
+
+    def decode(self, entry: str):
+        # (x, y) arrays of channel entry, x is None for "y" only data
+        data = None
+        if entry.endswith('.npy') or entry.endswith('.f32'):
+            data = self.buffer(entry)
+        if data is None:
+            return decode(entry, read_entry(self.zip_file, entry, self.folder))
+        if entry.endswith('.f32'):
+            magic, version, columns, rows = F32_HEADER.unpack_from(data)
+            if magic != F32_MAGIC:
+                raise ValueError('Wrong f32 header in %s' % entry)
+            values = numpy.frombuffer(data, dtype='<f4', count=rows * columns, offset=F32_HEADER.size)
+        else:
+            stream = io.BytesIO(data[:4096])
+            if numpy.lib.format.read_magic(stream) == (1, 0):
+                shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(stream)
+            else:
+                shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(stream)
+            if fortran_order or dtype.hasobject:
+                return decode(entry, bytes(data))
+            values = numpy.frombuffer(data, dtype=dtype, count=int(numpy.prod(shape)), offset=stream.tell())
+            rows = shape[0] if len(shape) > 0 else 1
+            columns = shape[1] if len(shape) > 1 else 1
+        values = values.reshape((rows, columns))
+        if columns == 1:
+            return None, values[:, 0]
+        return values[:, 0], values[:, 1]
+
+    def close(self):
+        self._channels = {}
+        self.zip_file.close()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # arrays viewing the file are still alive, mapping is released with them
+                pass
+            self._file.close()
+            self._mmap = None
+            self._file = None
@@ -0,0 +1,55 @@
+import sys
+
+from ShotBuffer import ShotBuffer
+
+sys.path.append('../TangoUtils')
+from TangoUtils import config_logger
+
+
+class ShotRecord(ShotBuffer):
+    # result of acquisition stage of one dumper item: detached channels with
+    # data arrays and properties, plus raw log strings and zip entries.
+    # Channels are encoded only in encode()/flush(), so acquisition and
+    # encoding can run in different threads or processes
+    def __init__(self, name: str = '', save_format: str = 'txt'):
+        super().__init__(name)
+        self.save_format = save_format
+
+    def add_channel(self, channel, folder: str = '', save_log: bool = False, save_data: bool = False,
+                    additional_marks: dict = None, save_properties: bool = True):
+        self.parts.append(('channel', (channel, folder, save_log, save_data, additional_marks, save_properties)))
+
+    def channels(self):
+        return [value[0] for kind, value in self.parts if kind == 'channel']
+
+    def encode(self, channel_settings: dict = None):
+        # encode stage: convert channels to log strings and zip entries,
+        # channel_settings - Channel attributes set by dumper, e.g. stream_points
+        buffer = ShotBuffer(self.name)
+        buffer.retries = self.retries
+        for kind, value in self.parts:
+            if kind == 'log':
+                buffer.write(value)
+            elif kind == 'zip':
+                buffer.writestr(*value)
+            elif kind == 'channel':
+                channel, folder, save_log, save_data, additional_marks, save_properties = value
+                try:
+                    if channel_settings:
+                        channel.configure(channel_settings)
+                    # x is replaced by properties only if both are written
+                    uniform = channel.uniform_x() if save_properties and save_data else None
+                    if save_properties:
+                        channel.save_properties(buffer, folder, uniform)
+                    if save_log:
+                        channel.save_log(buffer, additional_marks)
+                    if save_data:
+                        channel.save_data(buffer, folder, self.save_format, uniform)
+                except:
+                    config_logger().warning('%s channel %s encode error', self.name, channel.file_name)
+                    config_logger().debug('', exc_info=True)
+        return buffer
+
+    def flush(self, log_file, zip_file, dedup=None):
+        self.encode().flush(log_file, zip_file, dedup)
+        self.parts = []
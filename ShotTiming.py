@@ -0,0 +1,69 @@
+import collections
+import json
+import threading
+import time
+
+import numpy
+
+# shot processing phases, wall time of each stage, s; per item durations are kept in timing['items']
+PHASES = ('detect', 'read', 'encode', 'compress', 'write', 'total')
+
+
+class ShotTiming:
+    # rolling window of shot timings with optional JSON lines log
+    def __init__(self, size: int = 100, log_file_name: str = None):
+        self.shots = collections.deque(maxlen=max(int(size), 1))
+        self.log_file_name = log_file_name
+        self.lock = threading.Lock()
+
+    def add(self, timing: dict, shot: int = None):
+        with self.lock:
+            self.shots.append(timing)
+        if self.log_file_name:
+            line = {'shot': shot, 'time': time.time()}
+            line.update(timing)
+            with open(self.log_file_name, 'a') as log_file:
+                log_file.write(json.dumps(line) + '\n')
+
+    @staticmethod
+    def span_time(spans):
+        # wall time covered by (start, end) spans, overlapping spans of concurrent items are counted once
+        result = 0.0
+        end = None
+        for t0, t1 in sorted(spans):
+            if end is None or t0 > end:
+                result += t1 - t0
+                end = t1
+            elif t1 > end:
+                result += t1 - end
+                end = t1
+        return result
+
+    @staticmethod
+    def stats(values):
+        # last, mean, 95th percentile and max of values
+        if len(values) <= 0:
+            return [0.0, 0.0, 0.0, 0.0]
+        values = numpy.array(values, dtype=numpy.float64)
+        return [float(values[-1]), float(values.mean()), float(numpy.percentile(values, 95.0)), float(values.max())]
+
+    def phase_stats(self, phase: str):
+        with self.lock:
+            return self.stats([t.get(phase, 0.0) for t in self.shots])
+
+    def item_names(self):
+        with self.lock:
+            if len(self.shots) <= 0:
+                return []
+            return list(self.shots[-1].get('items', {}))
+
+    def item_stats(self, name: str, key: str):
+        with self.lock:
+            return self.stats([t['items'][name].get(key, 0.0) for t in self.shots
+                               if name in t.get('items', {})])
+
+    def last_item_values(self, key: str):
+        with self.lock:
+            if len(self.shots) <= 0:
+                return []
+            return [v.get(key, 0) for v in self.shots[-1].get('items', {}).values()]
@@ -0,0 +1,53 @@
+import atexit
+import logging
+import queue
+import threading
+
+
+class ShotWriter:
+    # background writer of collected shots with bounded queue,
+    # put() waits when queue is full, queued shots are written on stop() and at exit
+    def __init__(self, write, size: int = 2, logger=None):
+        self.write = write
+        self.queue = queue.Queue()
+        # free places in write queue
+        self.slots = threading.Semaphore(max(int(size), 1))
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.thread = threading.Thread(target=self.run, name='ShotWriter', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def reserve(self):
+        # wait for free place in write queue
+        if not self.slots.acquire(blocking=False):
+            self.logger.warning('Write queue is full, waiting for writer')
+            self.slots.acquire()
+
+    def put(self, job, reserved: bool = False):
+        if not reserved:
+            self.reserve()
+        self.queue.put(job)
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                self.write(*job)
+            except:
+                self.logger.error('Shot write error', exc_info=True)
+            finally:
+                self.slots.release()
+                self.queue.task_done()
+
+    def flush(self):
+        # wait until all queued shots are written
+        self.queue.join()
+
+    def stop(self):
+        if not self.thread.is_alive():
+            return
+        self.put(None)
+        self.thread.join()
+        atexit.unregister(self.stop)
@@ -20,6 +20,9 @@ from tango.server import Device, attribute, command, pipe, device_property
 
 from TangoServerPrototype import TangoServerPrototype, Configuration
 
+from AttributeHistory import history_image
+from DeviceProxyPool import DeviceProxyPool
+
 EMPTY_HISTORY = numpy.empty((0, 2))
 SERVER_CONFIG = ('log_level', 'config_file')
 DEFAULT_ATTRIB_CONFIG = {'ready': False, 'attribute': None, 'device_proxy': None,
@@ -29,7 +32,6 @@ DEFAULT_ATTRIB_CONFIG = {'ready': False, 'attribute': None, 'device_proxy': None
 class TangoAttributeHistoryServer(TangoServerPrototype):
     server_version = '1.0'
     server_name = 'Tango Attribute History Server'
-    tango_devices = {}
     logger = TangoServerPrototype.config_logger()
 
     @command(dtype_in=str, dtype_out=str)
@@ -98,10 +100,7 @@ class TangoAttributeHistoryServer(TangoServerPrototype):
                 scale = float(info.display_unit)
             except:
                 scale = 1.0
-            history = numpy.zeros((n, 2))
-            for i, d in enumerate(data):
-                history[i, 1] = d.value * scale
-                history[i, 0] = d.time.totime()
+            history = history_image(data, n, scale)
             attr.set_value(history)
             attr.set_quality(tango.AttrQuality.ATTR_VALID)
             # self.logger.debug('Reading OK')
@@ -128,26 +127,14 @@ class TangoAttributeHistoryServer(TangoServerPrototype):
             d_n, a_n = TangoAttributeHistoryServer.split_attribute_name(name)
             conf['device_name'] = d_n
             conf['attribute_name'] = a_n
-            # create device proxy
-            if d_n in TangoAttributeHistoryServer.tango_devices:
-                d_p = TangoAttributeHistoryServer.tango_devices[d_n]
-                self.logger.debug('Using existent proxy for %s', name)
-            else:
-                d_p = tango.DeviceProxy(d_n)
-                d_p.ready = False
-                TangoAttributeHistoryServer.tango_devices[d_n] = d_p
-                self.logger.debug('Proxy has been created for %s', name)
-            # check if device is on
-            if not d_p.ready:
-                try:
-                    ping = d_p.ping()
-                    d_p.ready = True
-                    self.logger.debug('Ping for %s is %s s', name, ping)
-                except:
-                    d_p.ready = False
-                    self.logger.debug('No ping for %s', name)
+            # get device proxy from shared pool
+            d_p = DeviceProxyPool.get(d_n)
+            # check if device is on, ready device is not pinged again
+            ready = DeviceProxyPool.is_ready(d_n) or DeviceProxyPool.ping(d_n)
+            if not ready:
+                self.logger.debug('No ping for %s', name)
             conf['device_proxy'] = d_p
-            if not d_p.ready:
+            if not ready:
                 self.logger.warning('Device is not ready for %s', name)
                 return conf
             # self.logger.debug('Device is ready for %s', name)
@@ -271,7 +258,7 @@ def read_attribute_history(name, delta_t=None):
     d_n, a_n = TangoAttributeHistoryServer.split_attribute_name(name)
     conf['device_name'] = d_n
     conf['attribute_name'] = a_n
-    d_p = tango.DeviceProxy(d_n)
+    d_p = DeviceProxyPool.get(d_n)
     conf['device_proxy'] = d_p
     try:
         if not d_p.is_attribute_polled(a_n):
@@ -299,10 +286,7 @@ def read_attribute_history(name, delta_t=None):
             scale = float(info.display_unit)
         except:
             scale = 1.0
-        history = numpy.zeros((n, 2))
-        for i, d in enumerate(data):
-            history[i, 1] = d.value * scale
-            history[i, 0] = d.time.totime()
+        history = history_image(data, n, scale)
         conf['ready'] = True
     except:
         logger.debug('', exc_info=True)
@@ -9,10 +9,15 @@ class TangoAttribute(PrototypeDumperDevice):
         self.force = force
         self.channel = PrototypeDumperDevice.Channel(self.device, attribute_name)
         self.channel.logger = self.logger
+        self.channel.prefetched = self.prefetched
 
-    def save(self, log_file, zip_file, folder=None):
+    def attribute_names(self):
+        return [self.attribute_name]
+
+    def acquire(self, folder=None):
         if folder is None:
             folder = self.folder
+        record = ShotRecord(self.name, self.save_format)
         # save_data and save_log flags
         properties = self.channel.read_properties(True)
         sdf = self.as_boolean(properties.get("save_data", [False])[0])
@@ -21,21 +26,21 @@ class TangoAttribute(PrototypeDumperDevice):
         if self.force:
             sdf = True
             slf = True
-        if sdf or slf:
-            self.read_attribute()
-            self.channel.save_properties(zip_file, folder)
-            if self.channel.y is None:
-                print('    ', self.channel.file_name, '---- No data')
-                return
+        if not (sdf or slf):
+            return record
+        self.read_attribute()
+        if self.channel.y is None:
+            print('    ', self.channel.file_name, '---- No data')
+            record.add_channel(self.channel.snapshot(), folder)
+            return record
+        addition = {}
         if slf:
-            addition = {}
             if self.channel.y_attr.data_format == tango._tango.AttrDataFormat.SCALAR:
                 # self.logger.debug("SCALAR attribute %s" % self.attribute_name)
                 if properties.get("history", [False])[0] != 'True':
                     addition = {'mark': self.channel.y}
-            self.channel.save_log(log_file, addition)
-        if sdf:
-            self.channel.save_data(zip_file, folder)
+        record.add_channel(self.channel.snapshot(slf), folder, slf, sdf, addition)
+        return record
 
     def read_attribute(self):
         self.channel.read_y()
@@ -3,13 +3,30 @@ import time
 import numpy
 import tango
 
+from AttributeHistory import history_arrays
+from HistoryCollector import HistoryCollector
 from TangoAttribute import TangoAttribute
 
 
 class TangoAttributeHistory(TangoAttribute):
-    def __init__(self, device_name, attribute_name, folder=None, delta_t=120.0, **kwargs):
+    def __init__(self, device_name, attribute_name, folder=None, delta_t=120.0, collect=False, **kwargs):
         super().__init__(device_name, attribute_name, folder, True, **kwargs)
         self.delta_t = delta_t
+        # keep history in background HistoryCollector instead of reading it at shot time
+        self.collect = collect
+        if self.collect:
+            HistoryCollector.register(device_name, attribute_name, delta_t, self)
+
+    def set_history_interval(self, interval: float):
+        # background history fetch interval, s
+        if self.collect:
+            HistoryCollector.register(self.name, self.channel.name, self.delta_t, self, interval)
+
+    def release(self):
+        # stop background history collection for this item
+        if self.collect:
+            HistoryCollector.unregister(self.name, self.channel.name, self)
+        super().release()
 
     def read_attribute(self):
         self.channel.read_y()
@@ -24,21 +41,22 @@ class TangoAttributeHistory(TangoAttribute):
         if period <= 0:
             self.logger.info("Attribute %s is not polled" % self.channel.name)
             return
+        if self.collect:
+            data = HistoryCollector.window(self.name, self.channel.name, self.delta_t)
+            if data is not None:
+                if len(data[0]) <= 0:
+                    self.logger.info("%s No values for %f seconds in history", self.channel.name, self.delta_t)
+                    return
+                self.channel.y, self.channel.x = data
+                return
         m = int(self.delta_t * 1000.0 / period + 10)
         history = self.device.attribute_history(self.channel.name, m)
         n = len(history)
         if n <= 0:
             self.logger.info("Empty history for %s" % self.channel.name)
             return
-        y = numpy.zeros(n)
-        x = numpy.zeros(n)
-        for i, h in enumerate(history):
-            if h.quality != tango._tango.AttrQuality.ATTR_VALID:
-                y[i] = numpy.nan
-            else:
-                y[i] = h.value
-                x[i] = h.time.totime()
-        index = numpy.logical_and(y != numpy.nan, x > (time.time() - self.delta_t))
+        y, x, valid = history_arrays(history)
+        index = numpy.logical_and(valid, x > (time.time() - self.delta_t))
         if len(y[index]) <= 0:
             self.logger.info("%s No values for %f seconds in history", self.channel.name, self.delta_t)
             return
@@ -1,6 +1,7 @@
 import numpy
 
 from TangoAttributeHistory import TangoAttributeHistory
+from TangoAttributeStats import trapezoid
 
 
 class TangoAttributeIntegral(TangoAttributeHistory):
@@ -11,6 +12,6 @@ class TangoAttributeIntegral(TangoAttributeHistory):
         self.channel.properties['history'] =['False']
         self.channel.properties['integral'] =['True']
         if self.channel.y is not None:
-            self.channel.y = numpy.trapz(self.channel.y, self.channel.x)
+            self.channel.y = trapezoid(self.channel.y, self.channel.x)
             self.channel.properties['delta_t'] =[str(numpy.ptp(self.channel.x))]
             self.channel.x = None
@@ -0,0 +1,49 @@
+import numpy
+
+from TangoAttributeHistory import TangoAttributeHistory
+from ShotRecord import ShotRecord
+
+# numpy.trapz is removed in numpy 2
+trapezoid = getattr(numpy, 'trapezoid', None) or getattr(numpy, 'trapz')
+
+# reduction name -> function(y, x), result is saved as <attribute>_<name>
+REDUCTIONS = {
+    'max': lambda y, x: numpy.max(y),
+    'min': lambda y, x: numpy.min(y),
+    'ptp': lambda y, x: numpy.ptp(y),
+    'integral': lambda y, x: trapezoid(y, x),
+    'mean': lambda y, x: numpy.mean(y),
+}
+
+
+class TangoAttributeStats(TangoAttributeHistory):
+    # several reductions of one attribute history fetch,
+    # each reduction is saved as TangoAttributeMax, TangoAttributeMin, ... does
+    def __init__(self, device_name, attribute_name, folder=None, delta_t=120.0,
+                 reductions=('max', 'min', 'ptp', 'integral'), **kwargs):
+        super().__init__(device_name, attribute_name, folder, delta_t, **kwargs)
+        self.reductions = [r for r in reductions if r in REDUCTIONS]
+        for r in reductions:
+            if r not in REDUCTIONS:
+                self.logger.warning('%s Unknown reduction %s', self.name, r)
+
+    def acquire(self, folder=None):
+        if folder is None:
+            folder = self.folder
+        record = ShotRecord(self.name, self.save_format)
+        self.channel.read_properties(True)
+        self.read_attribute()
+        for r in self.reductions:
+            channel = self.channel.snapshot()
+            channel.file_name = channel.name + '_' + r
+            channel.properties['history'] = ['False']
+            channel.properties[r] = ['True']
+            if self.channel.y is None:
+                print('    ', channel.file_name, '---- No data')
+                record.add_channel(channel, folder)
+                continue
+            channel.y = REDUCTIONS[r](self.channel.y, self.channel.x)
+            channel.properties['delta_t'] = [str(numpy.ptp(self.channel.x))]
+            channel.x = None
+            record.add_channel(channel, folder, True, True, {'mark': channel.y})
+        return record
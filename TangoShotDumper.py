@@ -6,16 +6,30 @@ Stand-alone version of Tango dumper
 A. L. Sanin, started 07.09.2021
 """
 import datetime
+import io
 import logging
 import os
 import sys
+import threading
 import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append('../TangoUtils')
 from Configuration import Configuration
 from config_logger import *
 
+from DeviceProxyPool import DeviceProxyPool
+from PropertyCache import PropertyCache
+from ShotBuffer import ShotBuffer
+from ShotContainer import ShotContainer, CONTAINER_EXTENSION
+from ShotDedup import ShotDedup
+from ShotIndex import ShotIndex
+from ShotRecord import ShotRecord
+from ShotTiming import ShotTiming
+from ShotWriter import ShotWriter
+from ZipCompressor import ZipCompressor, parse_codec, codec_benchmark, codec_report
+
 
 class TangoShotDumper:
     _version = '1.1'
@@ -45,7 +59,38 @@ class TangoShotDumper:
         self.out_root_dir = self.config.get("out_root_dir")
         self.shot_number_value = self.config.get("shot_number")
         self.shot_time_value = self.config.get("shot_time")
+        self.workers = self.config.get("workers", 1)
         self.dumper_items = []
+        self.device_groups = {}
+        # durations of last shot phases, s, and per item timing
+        self.timing = {}
+        self.timing_lock = threading.Lock()
+        # (start, end) of item read and encode stages of current shot, phase -> list
+        self.spans = {}
+        # timing of recent shots
+        self.shot_timing = ShotTiming()
+        # set by items receiving new shot events
+        self.shot_event = threading.Event()
+        # background writer, None - shots are written by process()
+        self.writer = None
+        # zip entries compression pool, None - entries are compressed during write
+        self.compressor = None
+        # default zip compression method and level
+        self.compression = zipfile.ZIP_DEFLATED
+        self.compresslevel = None
+        self.last_zip_file_name = None
+        # shot index database, None - no index
+        self.shot_index = None
+        # shots are appended to per day container file instead of separate zip files
+        self.container = False
+        # in memory zip file, shot number and shot time of shot appended to container
+        self.container_file_name = None
+        # ShotContainer opened for writing, kept open while shots go to the same container
+        self.shot_container = None
+        self.zip_buffer = None
+        self.zip_shot = (None, None)
+        # references to unchanged entries of previous shots, None - all entries are written
+        self.dedup = None
 
     def read_shot_number(self):
         return self.shot_number_value
@@ -73,13 +118,52 @@ class TangoShotDumper:
             self.logger.debug('Log level has been set to %s',
                               logging.getLevelName(self.logger.getEffectiveLevel()))
             self.config["sleep"] = self.config.get("sleep", 1.0)
+            # number of items saved concurrently
+            self.workers = self.config.get("workers", 1)
+            # number of shots for timing statistics and optional JSON lines timing log file
+            self.shot_timing = ShotTiming(self.config.get("timing_window", 100), self.config.get("timing_log", None))
+            # number of collected shots waiting for background writer, 0 - write in process()
+            if self.writer is not None:
+                self.writer.stop()
+                self.writer = None
+            if self.config.get("write_behind", 0) > 0:
+                self.writer = ShotWriter(self.write_shot, self.config.get("write_behind", 0), self.logger)
+            # channels of at least stream_points samples are formatted while written, 0 - never;
+            # uniformly spaced x is saved as x0, dx, x_last properties if its step is within tolerance, 0 - off
+            self.channel_settings = {'stream_points': self.config.get("stream_points", 0),
+                                     'uniform_x_tolerance': self.config.get("uniform_x", 0.0)}
+            # default compression codec, 'stored', 'deflate:N', 'bzip2:N' or 'lzma'
+            self.compression, self.compresslevel = parse_codec(self.config.get("compression", "deflate"))
+            # number of threads compressing zip entries, 0 - compress in writing thread
+            if self.compressor is not None:
+                self.compressor.shutdown()
+                self.compressor = None
+            if self.config.get("compress_workers", 0) > 0:
+                self.compressor = ZipCompressor(self.config.get("compress_workers", 0),
+                                                self.compression, self.compresslevel)
+                if not self.compressor.parallel:
+                    self.logger.warning('Parallel compression is not supported, entries are compressed while written')
+            # append shots to per day container file instead of separate zip files
+            self.container = self.config.get("container", False)
+            self.close_container()
+            # write entries unchanged since previous shot of the day as references
+            self.dedup = ShotDedup() if self.config.get("dedup", False) else None
             self.out_root_dir = self.config.get("out_root_dir", '.\\data\\')
+            # SQLite shot index file name, relative to out_root_dir, None - no index
+            self.shot_index = None
+            if self.config.get("shot_index", None):
+                self.shot_index = ShotIndex(os.path.join(self.out_root_dir, self.config.get("shot_index")),
+                                            self.out_root_dir)
             self.write_shot_number(self.config.get("shot_number", 1))
             self.write_shot_time(self.config.get("shot_time", time.time()))
-            # Restore devices
+            # Restore devices, settings of previous items in shared caches are released
             devices = self.config.get("devices", [])
+            old_items = self.dumper_items
             self.dumper_items = []
+            PropertyCache.release(self)
+            DeviceProxyPool.release(self)
             if len(devices) <= 0:
+                self.release_items(old_items)
                 self.logger.error("No devices declared")
                 return False
             for device in devices:
@@ -89,12 +173,16 @@ class TangoShotDumper:
                     if 'eval' in device:
                         item = eval(device["eval"])
                         item.logger = self.logger
+                        item.shot_event = self.shot_event
+                        self.configure_item(item)
                         self.dumper_items.append(item)
                         self.logger.info("%s has been added" % item.name)
                     else:
                         self.logger.info("No 'eval' option for %s" % device)
                 except:
                     log_exception(self, "Device creation error in %s", str(device), level=logging.WARNING)
+            self.release_items(old_items)
+            self.group_items()
             if len(self.dumper_items) > 0:
                 self.logger.debug('%d dumper devices has been configured', len(self.dumper_items))
                 return True
@@ -105,6 +193,28 @@ class TangoShotDumper:
             log_exception(self, 'Configuration set error for %s', file_name, level=logging.WARNING)
             return False
 
+    def configure_item(self, item):
+        # per item settings of shared caches and channels
+        item.channel_settings = self.channel_settings
+        # attribute properties cache time to live, s
+        PropertyCache.set_ttl(item.name, self.config.get("property_ttl", 60.0), self)
+        # shared device proxy client timeout, ms, and reconnection interval, s
+        DeviceProxyPool.configure(item.name, self, self.config.get("proxy_timeout", None),
+                                  self.config.get("proxy_back_off", 10.0))
+        # background history collection interval, s
+        if hasattr(item, 'set_history_interval'):
+            item.set_history_interval(self.config.get("history_interval", 1.0))
+
+    @staticmethod
+    def release_items(items):
+        # stop background activity of removed items
+        for item in items:
+            try:
+                if hasattr(item, 'release'):
+                    item.release()
+            except:
+                pass
+
     def write_config(self, file_name=None):
         try:
             self.config.write(file_name)
@@ -136,24 +246,40 @@ class TangoShotDumper:
                 log_exception(self, "Error checking new shot for %s", item)
         return False
 
+    def wait_shot_event(self, timeout: float):
+        # sleep for timeout or until new shot event received from an item
+        if self.shot_event.wait(timeout):
+            self.shot_event.clear()
+
+    @staticmethod
+    def shot_datetime(shot_time: float = None):
+        # local date and time of shot, current time if shot time is unknown
+        if not shot_time:
+            return datetime.datetime.today()
+        return datetime.datetime.fromtimestamp(shot_time)
+
     @staticmethod
-    def date_time_stamp():
-        return datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')
+    def date_time_stamp(dt=None):
+        if dt is None:
+            dt = datetime.datetime.today()
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
 
     @staticmethod
     def time_stamp():
         return datetime.datetime.today().strftime('%H:%M:%S')
 
     @staticmethod
-    def get_log_folder():
-        ydf = datetime.datetime.today().strftime('%Y')
-        mdf = datetime.datetime.today().strftime('%Y-%m')
-        ddf = datetime.datetime.today().strftime('%Y-%m-%d')
+    def get_log_folder(dt=None):
+        if dt is None:
+            dt = datetime.datetime.today()
+        ydf = dt.strftime('%Y')
+        mdf = dt.strftime('%Y-%m')
+        ddf = dt.strftime('%Y-%m-%d')
         folder = os.path.join(ydf, mdf, ddf)
         return folder
 
-    def make_log_folder(self):
-        of = os.path.join(self.out_root_dir, self.get_log_folder())
+    def make_log_folder(self, dt=None):
+        of = os.path.join(self.out_root_dir, self.get_log_folder(dt))
         try:
             if not os.path.exists(of):
                 os.makedirs(of)
@@ -185,22 +311,314 @@ class TangoShotDumper:
         self.lock_file = None
         self.logger.debug("Directory unlocked")
 
-    def open_log_file(self, folder: str = ''):
-        log_file = open(os.path.join(folder, self.get_log_file_name()), 'a')
+    def open_log_file(self, folder: str = '', dt=None):
+        log_file = open(os.path.join(folder, self.get_log_file_name(dt)), 'a')
         return log_file
 
     @staticmethod
-    def get_log_file_name():
-        file_name = datetime.datetime.today().strftime('%Y-%m-%d.log')
+    def get_log_file_name(dt=None):
+        if dt is None:
+            dt = datetime.datetime.today()
+        file_name = dt.strftime('%Y-%m-%d.log')
         return file_name
 
     @staticmethod
-    def open_zip_file(folder):
-        fn = datetime.datetime.today().strftime('%Y-%m-%d_%H%M%S.zip')
-        zip_file_name = os.path.join(folder, fn)
-        zip_file = zipfile.ZipFile(zip_file_name, 'a', compression=zipfile.ZIP_DEFLATED)
+    def open_zip_file(folder, compression=zipfile.ZIP_DEFLATED, compresslevel=None, dt=None):
+        # zip file named by shot time, shots within one second get numbered names
+        if dt is None:
+            dt = datetime.datetime.today()
+        fn = dt.strftime('%Y-%m-%d_%H%M%S')
+        zip_file_name = os.path.join(folder, fn + '.zip')
+        n = 1
+        while os.path.exists(zip_file_name):
+            zip_file_name = os.path.join(folder, '%s_%d.zip' % (fn, n))
+            n += 1
+        zip_file = zipfile.ZipFile(zip_file_name, 'x', compression=compression, compresslevel=compresslevel)
         return zip_file
 
+    @staticmethod
+    def get_container_file_name(dt=None):
+        if dt is None:
+            dt = datetime.datetime.today()
+        file_name = dt.strftime('%Y-%m-%d') + CONTAINER_EXTENSION
+        return file_name
+
+    def acquire_item(self, item):
+        # acquisition stage for one item, returns ShotRecord or ShotBuffer
+        print("Saving from %s" % item.name)
+        buffer = ShotBuffer(item.name)
+        try:
+            if hasattr(item, 'acquire'):
+                return item.acquire()
+            # items without acquisition stage are saved to in-memory buffer
+            item.save(buffer, buffer)
+        except:
+            log_exception(self, "Exception saving %s", str(item))
+        finally:
+            # values prefetched for this shot and not read by item are dropped
+            if hasattr(item, 'prefetched'):
+                item.prefetched.clear()
+        return buffer
+
+    def read_item(self, item):
+        # acquire and encode item data, used by worker threads
+        t0 = time.time()
+        record = self.acquire_item(item)
+        t1 = time.time()
+        self.add_span('read', t0, t1)
+        with self.timing_lock:
+            self.timing.setdefault('items', {})[self.item_label(item)] = {'read': t1 - t0}
+        return self.encode_item(item, record)
+
+    def encode_item(self, item, record):
+        # encode acquired item data and start its compression
+        t0 = time.time()
+        if isinstance(record, ShotRecord):
+            record = record.encode(getattr(item, 'channel_settings', None))
+        t1 = time.time()
+        self.add_span('encode', t0, t1)
+        with self.timing_lock:
+            self.timing.setdefault('items', {}).setdefault(self.item_label(item), {}).update(
+                {'encode': t1 - t0, 'bytes': record.size(), 'retries': record.retries})
+        try:
+            record.set_compression(*parse_codec(getattr(item, 'compression', None)))
+        except:
+            log_exception(self, "Compression codec error for %s", item.name, level=logging.WARNING)
+        if self.compressor is not None:
+            record.compress(self.compressor)
+        return record
+
+    @staticmethod
+    def item_label(item):
+        attribute_name = getattr(item, 'attribute_name', None)
+        if attribute_name is None:
+            return str(item.name)
+        return '%s/%s' % (item.name, attribute_name)
+
+    def add_timing(self, phase: str, dt: float, timing: dict = None):
+        if timing is None:
+            timing = self.timing
+        with self.timing_lock:
+            timing[phase] = timing.get(phase, 0.0) + dt
+
+    def add_span(self, phase: str, t0: float, t1: float):
+        with self.timing_lock:
+            self.spans.setdefault(phase, []).append((t0, t1))
+
+    def add_span_timing(self):
+        # 'read' and 'encode' phases are wall times covered by item spans, items are not synchronized
+        # between stages, so reading of one item overlaps encoding and writing of others
+        with self.timing_lock:
+            spans = self.spans
+            self.spans = {}
+        for phase, values in spans.items():
+            self.add_timing(phase, ShotTiming.span_time(values))
+
+    def flush_item(self, buffer, log_file, zip_file, timing: dict = None):
+        # compress and write encoded item data
+        t0 = time.time()
+        buffer.flush(log_file, zip_file, self.dedup)
+        self.add_timing('compress', time.time() - t0, timing)
+
+    def group_items(self):
+        # items reading attributes of the same device, device name -> list of items
+        self.device_groups = {}
+        for item in self.dumper_items:
+            if hasattr(item, 'attribute_names') and hasattr(item, 'prefetched'):
+                self.device_groups.setdefault(item.name.lower(), []).append(item)
+        return self.device_groups
+
+    def prepare_items(self, items):
+        # read attribute properties and values of items sharing a device by one call per device
+        shot = self.shot_number_value
+        for group in self.device_groups.values():
+            group = [item for item in group if item in items and item.device is not None]
+            if len(group) <= 0:
+                continue
+            device = group[0].device
+            names = []
+            for item in group:
+                item.prefetched.clear()
+                for name in item.attribute_names():
+                    if name not in names:
+                        names.append(name)
+            if len(names) <= 0:
+                continue
+            try:
+                PropertyCache.prefetch(device, names)
+            except:
+                log_exception(self, "Properties prefetch error for %s", device.name(), level=logging.WARNING)
+            if len(group) <= 1:
+                continue
+            try:
+                values = group[0].read_attributes(names)
+                # values read after next shot was detected are dropped
+                if shot != self.shot_number_value:
+                    return
+                for item in group:
+                    for name in item.attribute_names():
+                        if name in values:
+                            item.prefetched[name] = values[name]
+            except:
+                log_exception(self, "read_attributes error for %s", device.name(), level=logging.WARNING)
+
+    def save_items(self, log_file, zip_file):
+        items = [item for item in self.dumper_items if item.active]
+        t0 = time.time()
+        self.prepare_items(items)
+        self.add_span('read', t0, time.time())
+        try:
+            if self.workers <= 1:
+                for item in items:
+                    self.flush_item(self.read_item(item), log_file, zip_file)
+                return
+            # read items concurrently, write collected output in configured order
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.read_item, item) for item in items]
+                for future in futures:
+                    self.flush_item(future.result(), log_file, zip_file)
+        finally:
+            self.add_span_timing()
+
+    def read_items(self):
+        # acquire and encode all active items, returns buffers in configured order
+        items = [item for item in self.dumper_items if item.active]
+        t0 = time.time()
+        self.prepare_items(items)
+        self.add_span('read', t0, time.time())
+        try:
+            if self.workers <= 1:
+                return [self.read_item(item) for item in items]
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(self.read_item, items))
+        finally:
+            self.add_span_timing()
+
+    def shot_header(self):
+        # new shot - date and time, shot number and shot time for log file,
+        # date and time are of shot detection, so shots written later keep their day and file name
+        dts = self.date_time_stamp(self.shot_datetime(self.shot_time_value))
+        self.config['shot_dts'] = dts
+        print("\r\n%s New Shot %d" % (dts, self.shot_number_value))
+        return '%s; Shot=%d; Shot_time=%s' % (dts, self.shot_number_value, self.shot_time_value)
+
+    def open_shot(self, header: str = None):
+        # open output files and write shot header
+        if header is None:
+            header = self.shot_header()
+        # output folder and file names follow shot time from header, not time of writing
+        shot = ShotIndex.parse_line(header)
+        dt = self.shot_datetime(shot['time'])
+        self.make_log_folder(dt)
+        self.lock_output_dir()
+        self.log_file = self.open_log_file(self.out_dir, dt)
+        # Write date and time, shot number
+        self.log_file.write(header)
+        # Open zip file
+        if self.container:
+            # shot zip is built in memory and appended to container on close
+            self.zip_shot = (shot['shot'], shot['time'])
+            self.container_file_name = os.path.join(self.out_dir, self.get_container_file_name(dt))
+            try:
+                self.open_container()
+            except:
+                self.log_file.close()
+                self.unlock_output_dir()
+                raise
+            self.zip_buffer = io.BytesIO()
+            self.zip_file = zipfile.ZipFile(self.zip_buffer, 'w', compression=self.compression,
+                                            compresslevel=self.compresslevel)
+        else:
+            self.zip_file = self.open_zip_file(self.out_dir, self.compression, self.compresslevel, dt)
+        if self.dedup is not None:
+            if self.container:
+                # offset of record keeps references unique if shot numbers repeat within a day
+                location = '%s#%d@%d' % (self.container_file_name, self.zip_shot[0],
+                                         self.shot_container.next_offset())
+            else:
+                location = self.zip_file.filename
+            self.dedup.begin(location)
+
+    def close_shot(self, write_config: bool = True):
+        if self.container:
+            self.zip_file.close()
+            container = self.shot_container
+            shot, shot_time = self.zip_shot
+            if shot_time is None:
+                shot_time = time.time()
+            offset = container.append(shot, shot_time, self.zip_buffer.getvalue())
+            self.zip_buffer = None
+            # container entry is referenced as file_name#shot@offset, shot numbers may repeat within a day
+            zfn = '%s#%d@%d' % (os.path.basename(container.file_name), shot, offset)
+            self.last_zip_file_name = os.path.join(self.out_dir, zfn)
+        else:
+            zfn = os.path.basename(self.zip_file.filename)
+            self.zip_file.close()
+            self.last_zip_file_name = self.zip_file.filename
+        self.log_file.write('; File=%s\n' % zfn)
+        self.log_file.close()
+        if self.dedup is not None:
+            self.dedup.commit()
+        if self.shot_index is not None:
+            try:
+                self.shot_index.add_last_shot(self.log_file.name)
+            except:
+                log_exception(self, "Shot index update error", level=logging.WARNING)
+        self.unlock_output_dir()
+        if write_config:
+            self.write_config()
+
+    def open_container(self):
+        # writer of current container, interrupted appends are removed once when it is opened
+        if self.shot_container is not None and self.shot_container.file_name != self.container_file_name:
+            self.close_container()
+        if self.shot_container is None:
+            self.shot_container = ShotContainer(self.container_file_name, 'a')
+        return self.shot_container
+
+    def close_container(self):
+        if self.shot_container is not None:
+            self.shot_container.close()
+            self.shot_container = None
+
+    def codec_report(self):
+        # compression ratio and time of available codecs on last shot zip file
+        if self.last_zip_file_name is None:
+            return 'No shots written'
+        file_name, _, shot = self.last_zip_file_name.partition('#')
+        if shot:
+            shot, _, offset = shot.partition('@')
+            zip_file = io.BytesIO(ShotContainer(file_name).read(int(shot), int(offset) if offset else None))
+        else:
+            zip_file = file_name
+        return self.last_zip_file_name + '\n' + codec_report(codec_benchmark(zip_file))
+
+    def submit_shot(self, header: str, buffers, t0: float):
+        # pass collected shot to background writer, waits if write queue is full
+        t1 = time.time()
+        self.write_config()
+        self.writer.reserve()
+        self.add_timing('write', time.time() - t1)
+        self.timing['total'] = time.time() - t0
+        self.writer.put((header, buffers, self.timing, self.shot_number_value), True)
+
+    def write_shot(self, header: str, buffers, timing: dict, shot_number: int):
+        # write collected shot, called by background writer
+        try:
+            t0 = time.time()
+            self.open_shot(header)
+            self.add_timing('write', time.time() - t0, timing)
+            for buffer in buffers:
+                self.flush_item(buffer, self.log_file, self.zip_file, timing)
+            t0 = time.time()
+            self.close_shot(False)
+            self.add_timing('write', time.time() - t0, timing)
+        except:
+            log_exception(self, "Shot %s write error", shot_number)
+            if self.locked:
+                self.unlock_output_dir()
+        self.shot_timing.add(timing, shot_number)
+
     def process(self):
         try:
             # activate items in self.dumper_items
@@ -208,34 +626,25 @@ class TangoShotDumper:
                 self.logger.info("No active devices")
                 return
             # check for new shot
+            t0 = time.time()
             if not self.check_new_shot():
                 return
-            # new shot - save signals
-            dts = self.date_time_stamp()
-            self.config['shot_dts'] = dts
-            print("\r\n%s New Shot %d" % (dts, self.shot_number_value))
-            self.make_log_folder()
-            self.lock_output_dir()
-            self.log_file = self.open_log_file(self.out_dir)
-            # Write date and time
-            self.log_file.write(dts)
-            # Write shot number
-            self.log_file.write('; Shot=%d; Shot_time=%s' % (self.shot_number_value, self.shot_time_value))
-            # Open zip file
-            self.zip_file = self.open_zip_file(self.out_dir)
-            for item in self.dumper_items:
-                if item.active:
-                    print("Saving from %s" % item.name)
-                    try:
-                        item.save(self.log_file, self.zip_file)
-                    except:
-                        log_exception(self, "Exception saving %s", str(item))
-            zfn = os.path.basename(self.zip_file.filename)
-            self.zip_file.close()
-            self.log_file.write('; File=%s\n' % zfn)
-            self.log_file.close()
-            self.unlock_output_dir()
-            self.write_config()
+            self.timing = {'detect': time.time() - t0}
+            if self.writer is not None:
+                # collect shot, compression and writing are left to background writer
+                header = self.shot_header()
+                self.submit_shot(header, self.read_items(), t0)
+            else:
+                # new shot - save signals
+                t1 = time.time()
+                self.open_shot()
+                self.add_timing('write', time.time() - t1)
+                self.save_items(self.log_file, self.zip_file)
+                t1 = time.time()
+                self.close_shot()
+                self.add_timing('write', time.time() - t1)
+                self.timing['total'] = time.time() - t0
+                self.shot_timing.add(self.timing, self.shot_number_value)
         except:
             log_exception(self, "Unexpected exception")
         print(self.time_stamp(), "Waiting for next shot ...")
@@ -247,7 +656,7 @@ if __name__ == "__main__":
     if tsd.set_config():
         t0 = time.time()
         while True:
-            time.sleep(tsd.config['sleep'])
+            tsd.wait_shot_event(tsd.config['sleep'])
             try:
                 tsd.process()
             except:
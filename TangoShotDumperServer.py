@@ -5,10 +5,12 @@
 Shot dumper tango device server
 A. L. Sanin, started 25.06.2021
 """
+import asyncio
 import datetime
 import logging
 import os
 import sys
+import threading
 import time
 import json
 import zipfile
@@ -18,13 +20,15 @@ from tango import AttrQuality, AttrWriteType, DispLevel, DevState
 from tango.server import Device, attribute, command, pipe, device_property
 
 
-from TangoShotDumper import TangoShotDumper
+from AsyncTangoShotDumper import AsyncTangoShotDumper
+from PropertyCache import PropertyCache
+from ShotTiming import PHASES
 sys.path.append('../TangoUtils')
 from TangoServerPrototype import TangoServerPrototype
 from TangoUtils import log_exception
 
 
-class TangoShotDumperServer(TangoServerPrototype, TangoShotDumper):
+class TangoShotDumperServer(TangoServerPrototype, AsyncTangoShotDumper):
     server_version = '1.1'
     server_name = 'Tango Shot Dumper Server'
 
@@ -40,7 +44,76 @@ class TangoShotDumperServer(TangoServerPrototype, TangoShotDumper):
                           unit="s", format="%f",
                           doc="Last shot time")
 
+    dead_time = attribute(label="dead_time", dtype=float,
+                          display_level=DispLevel.OPERATOR,
+                          access=AttrWriteType.READ,
+                          unit="s", format="%f",
+                          doc="Last shot processing time")
+
+    dead_time_stats = attribute(label="dead_time_stats", dtype=(float,),
+                                max_dim_x=4,
+                                display_level=DispLevel.EXPERT,
+                                access=AttrWriteType.READ,
+                                unit="s", format="%f",
+                                doc="Shot processing time [last, mean, p95, max] over timing window")
+
+    phase_names = attribute(label="phase_names", dtype=(str,),
+                            max_dim_x=len(PHASES),
+                            display_level=DispLevel.EXPERT,
+                            access=AttrWriteType.READ,
+                            doc="Shot processing phases, rows of phase_times")
+
+    phase_times = attribute(label="phase_times", dtype=((float,),),
+                            max_dim_x=4, max_dim_y=len(PHASES),
+                            display_level=DispLevel.EXPERT,
+                            access=AttrWriteType.READ,
+                            unit="s", format="%f",
+                            doc="Phase wall times [last, mean, p95, max], one row per phase")
+
+    item_names = attribute(label="item_names", dtype=(str,),
+                           max_dim_x=4096,
+                           display_level=DispLevel.EXPERT,
+                           access=AttrWriteType.READ,
+                           doc="Dumper items of last shot, rows of item_* attributes")
+
+    item_read_times = attribute(label="item_read_times", dtype=((float,),),
+                                max_dim_x=4, max_dim_y=4096,
+                                display_level=DispLevel.EXPERT,
+                                access=AttrWriteType.READ,
+                                unit="s", format="%f",
+                                doc="Item read durations [last, mean, p95, max], one row per item, "
+                                    "items of one phase may be read concurrently")
+
+    item_encode_times = attribute(label="item_encode_times", dtype=((float,),),
+                                  max_dim_x=4, max_dim_y=4096,
+                                  display_level=DispLevel.EXPERT,
+                                  access=AttrWriteType.READ,
+                                  unit="s", format="%f",
+                                  doc="Item encode durations [last, mean, p95, max], one row per item, "
+                                      "items of one phase may be encoded concurrently")
+
+    item_bytes = attribute(label="item_bytes", dtype=(int,),
+                           max_dim_x=4096,
+                           display_level=DispLevel.EXPERT,
+                           access=AttrWriteType.READ,
+                           unit="B", format="%d",
+                           doc="Uncompressed bytes written by items for last shot")
+
+    item_retries = attribute(label="item_retries", dtype=(int,),
+                             max_dim_x=4096,
+                             display_level=DispLevel.EXPERT,
+                             access=AttrWriteType.READ,
+                             unit="", format="%d",
+                             doc="Read retries of items for last shot")
+
+    @command(dtype_in=None, dtype_out=str)
+    def codec_benchmark(self):
+        # compression ratio and time of codecs on last shot
+        return self.codec_report()
+
     def init_device(self):
+        # Init command rereads attribute properties from DB
+        PropertyCache.invalidate()
         # init base class TangoServerPrototype self.set_config() will be called insight
         TangoServerPrototype.init_device(self)
         if self.get_state() ==  DevState.RUNNING:
@@ -71,33 +144,77 @@ class TangoShotDumperServer(TangoServerPrototype, TangoShotDumper):
             except:
                 value = 0.0
             self.write_shot_time(value)
-            # init ShortDumper part
-            TangoShotDumper.__init__(self, self.config.file_name)
-            # set_config for TangoShotDumper part
-            TangoShotDumper.set_config(self)
+            # write shots queued with previous configuration
+            if getattr(self, 'writer', None) is not None:
+                self.writer.stop()
+            if getattr(self, 'compressor', None) is not None:
+                self.compressor.shutdown()
+            if getattr(self, 'executor', None) is not None:
+                self.executor.shutdown(wait=False)
+            # container lock is released, writer is reopened by next shot
+            if getattr(self, 'shot_container', None) is not None:
+                self.close_container()
+            # init ShortDumper part, previous items are released by set_config after new ones are registered
+            items = getattr(self, 'dumper_items', [])
+            AsyncTangoShotDumper.__init__(self, self.config.file_name)
+            self.dumper_items = items
+            # set_config for AsyncTangoShotDumper part
+            AsyncTangoShotDumper.set_config(self)
             return True
         except:
             log_exception('Configuration set error for %s', self.config.file_name)
             return False
 
+    def read_dead_time(self):
+        return self.shot_timing.phase_stats('total')[0]
+
+    def read_dead_time_stats(self):
+        return self.shot_timing.phase_stats('total')
+
+    def read_phase_names(self):
+        return list(PHASES)
+
+    def read_phase_times(self):
+        return [self.shot_timing.phase_stats(phase) for phase in PHASES]
+
+    def read_item_names(self):
+        return self.shot_timing.item_names()
+
+    def read_item_read_times(self):
+        return [self.shot_timing.item_stats(name, 'read') for name in self.shot_timing.item_names()]
+
+    def read_item_encode_times(self):
+        return [self.shot_timing.item_stats(name, 'encode') for name in self.shot_timing.item_names()]
+
+    def read_item_bytes(self):
+        return self.shot_timing.last_item_values('bytes')
+
+    def read_item_retries(self):
+        return self.shot_timing.last_item_values('retries')
+
+
+# asyncio loop running dumper devices in background thread and device -> task of AsyncTangoShotDumper.run
+dumper_loop = None
+dumper_tasks = {}
+
 
 def looping():
-    t0 = time.time()
+    # every device runs its own task, so a slow or hanging device does not delay shots of others
+    global dumper_loop
+    if dumper_loop is None:
+        dumper_loop = asyncio.new_event_loop()
+        threading.Thread(target=dumper_loop.run_forever, name='dumper_loop', daemon=True).start()
     for dev in TangoShotDumperServer.device_list:
-        dt = time.time() - t0
-        if dt < dev.config['sleep']:
-            time.sleep(dev.config['sleep'] - dt)
-        t0 = time.time()
-        try:
-            dev.process()
-            # msg = '%s processed' % dev.name
-            # dev.logger.debug(msg)
-            # dev.debug_stream(msg)
-        except:
+        task = dumper_tasks.get(dev)
+        if task is not None and not task.done():
+            continue
+        if task is not None and task.exception() is not None:
             msg = '%s process error' % dev
             dev.logger.warning(msg)
             dev.error_stream(msg)
-            dev.logger.debug('', exc_info=True)
+            dev.logger.debug('', exc_info=task.exception())
+        dumper_tasks[dev] = asyncio.run_coroutine_threadsafe(dev.run(), dumper_loop)
+    time.sleep(0.1)
 
 
 if __name__ == "__main__":
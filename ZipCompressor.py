@@ -0,0 +1,192 @@
+import io
+import sys
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# codec name -> zip compression method, codec is configured as 'name' or 'name:level'
+CODECS = {'stored': zipfile.ZIP_STORED, 'deflate': zipfile.ZIP_DEFLATED,
+          'bzip2': zipfile.ZIP_BZIP2, 'lzma': zipfile.ZIP_LZMA}
+DEFAULT_LEVELS = {zipfile.ZIP_DEFLATED: zlib.Z_DEFAULT_COMPRESSION, zipfile.ZIP_BZIP2: 9}
+BENCHMARK_CODECS = ('stored', 'deflate:1', 'deflate:6', 'deflate:9', 'bzip2:9', 'lzma')
+# members compressed in pool are appended by write_compressed, which repeats ZipFile.open(zinfo, 'w')
+# with private zipfile internals. They are checked on Python 3.8 - 3.13, on other versions
+# or if internals are missing entries are compressed by ZipFile.writestr in writing thread
+PARALLEL_WRITE = ((3, 8) <= sys.version_info[:2] <= (3, 13) and
+                  all(hasattr(zipfile, name) for name in ('_get_compressor', '_MASK_COMPRESS_OPTION_1',
+                                                          '_MASK_USE_DATA_DESCRIPTOR', '_DD_SIGNATURE')) and
+                  hasattr(zipfile.ZipFile, '_writecheck'))
+
+
+def parse_codec(codec: str):
+    # 'deflate:6' -> (ZIP_DEFLATED, 6), None -> (None, None)
+    if codec is None:
+        return None, None
+    name, _, level = str(codec).strip().lower().partition(':')
+    if name not in CODECS:
+        raise ValueError('Unknown compression codec %s' % codec)
+    if CODECS[name] in (zipfile.ZIP_STORED, zipfile.ZIP_LZMA):
+        return CODECS[name], None
+    if level == '':
+        # codec default, not level of dumper default codec
+        return CODECS[name], DEFAULT_LEVELS[CODECS[name]]
+    return CODECS[name], int(level)
+
+
+def codec_benchmark(zip_file_name: str, codecs=BENCHMARK_CODECS):
+    # recompress all entries of zip file with every codec,
+    # returns list of (codec, data size, compressed size, time s)
+    with zipfile.ZipFile(zip_file_name, 'r') as zip_file:
+        entries = [zip_file.read(zinfo) for zinfo in zip_file.infolist()]
+    size = sum(len(data) for data in entries)
+    result = []
+    for codec in codecs:
+        compression, level = parse_codec(codec)
+        t0 = time.time()
+        compressed = 0
+        with zipfile.ZipFile(io.BytesIO(), 'w') as zip_file:
+            for i, data in enumerate(entries):
+                zip_file.writestr('%d' % i, data, compression, level)
+            for zinfo in zip_file.infolist():
+                compressed += zinfo.compress_size
+        result.append((codec, size, compressed, time.time() - t0))
+    return result
+
+
+def codec_report(rows):
+    lines = ['%-10s %12s %8s %10s' % ('codec', 'size, B', 'ratio', 'time, s')]
+    for codec, size, compressed, dt in rows:
+        ratio = size / compressed if compressed > 0 else 0.0
+        lines.append('%-10s %12d %8.2f %10.4f' % (codec, compressed, ratio, dt))
+    return '\n'.join(lines)
+
+
+def get_compresslevel(zinfo: zipfile.ZipInfo):
+    # ZipInfo attribute is public compress_level since Python 3.13
+    if hasattr(zinfo, 'compress_level'):
+        return zinfo.compress_level
+    return zinfo._compresslevel
+
+
+def set_compresslevel(zinfo: zipfile.ZipInfo, compresslevel):
+    if hasattr(zinfo, 'compress_level'):
+        zinfo.compress_level = compresslevel
+    else:
+        zinfo._compresslevel = compresslevel
+
+
+def make_info(zinfo_or_arcname, compression=zipfile.ZIP_DEFLATED, compresslevel=None):
+    # ZipInfo as ZipFile.writestr creates it
+    if isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+        return zinfo_or_arcname
+    zinfo = zipfile.ZipInfo(filename=zinfo_or_arcname, date_time=time.localtime(time.time())[:6])
+    zinfo.compress_type = compression
+    set_compresslevel(zinfo, compresslevel)
+    if zinfo.filename[-1] == '/':
+        zinfo.external_attr = 0o40775 << 16
+        zinfo.external_attr |= 0x10
+    else:
+        zinfo.external_attr = 0o600 << 16
+    return zinfo
+
+
+def compress_entry(zinfo: zipfile.ZipInfo, data):
+    # compressed member data, CRC and sizes are set in zinfo,
+    # data is str, bytes or iterable of bytes chunks
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if isinstance(data, (bytes, bytearray)):
+        data = (data,)
+    compressor = zipfile._get_compressor(zinfo.compress_type, get_compresslevel(zinfo))
+    compressed = []
+    size = 0
+    crc = 0
+    for chunk in data:
+        size += len(chunk)
+        crc = zlib.crc32(chunk, crc)
+        compressed.append(chunk if compressor is None else compressor.compress(chunk))
+    if compressor is not None:
+        compressed.append(compressor.flush())
+    compressed = b''.join(compressed)
+    zinfo.file_size = size
+    zinfo.CRC = crc
+    zinfo.compress_size = len(compressed)
+    return zinfo, compressed
+
+
+def write_stream(zip_file: zipfile.ZipFile, zinfo_or_arcname, chunks, compress_type=None, compresslevel=None):
+    # write member from iterable of bytes chunks without joining them
+    zinfo = make_info(zinfo_or_arcname, zip_file.compression, zip_file.compresslevel)
+    if compress_type is not None:
+        zinfo.compress_type = compress_type
+    if compresslevel is not None:
+        set_compresslevel(zinfo, compresslevel)
+    with zip_file.open(zinfo, 'w') as dest:
+        for chunk in chunks:
+            dest.write(chunk)
+
+
+def write_compressed(zip_file: zipfile.ZipFile, zinfo: zipfile.ZipInfo, compressed):
+    # append member compressed by compress_entry, the same as ZipFile.open(zinfo, 'w') does
+    if not PARALLEL_WRITE:
+        raise RuntimeError('Writing of compressed members is not supported on Python %d.%d' %
+                           sys.version_info[:2])
+    if not zip_file.fp:
+        raise ValueError("Attempt to write to ZIP archive that was already closed")
+    with zip_file._lock:
+        if zip_file._writing:
+            raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+        zinfo.flag_bits = 0x00
+        if zinfo.compress_type == zipfile.ZIP_LZMA:
+            zinfo.flag_bits |= zipfile._MASK_COMPRESS_OPTION_1
+        if not zip_file._seekable:
+            zinfo.flag_bits |= zipfile._MASK_USE_DATA_DESCRIPTOR
+        if not zinfo.external_attr:
+            zinfo.external_attr = 0o600 << 16
+        zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+        if zip64 and not zip_file._allowZip64:
+            raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+        if zip_file._seekable:
+            zip_file.fp.seek(zip_file.start_dir)
+        zinfo.header_offset = zip_file.fp.tell()
+        zip_file._writecheck(zinfo)
+        zip_file._didModify = True
+        zip_file.fp.write(zinfo.FileHeader(zip64))
+        zip_file.fp.write(compressed)
+        if zinfo.flag_bits & zipfile._MASK_USE_DATA_DESCRIPTOR:
+            fmt = '<LLQQ' if zip64 else '<LLLL'
+            zip_file.fp.write(zipfile.struct.pack(fmt, zipfile._DD_SIGNATURE, zinfo.CRC,
+                                                  zinfo.compress_size, zinfo.file_size))
+        zip_file.start_dir = zip_file.fp.tell()
+        zip_file.filelist.append(zinfo)
+        zip_file.NameToInfo[zinfo.filename] = zinfo
+
+
+class ZipCompressor:
+    # compresses zip entries in thread pool, zlib, bz2 and lzma release GIL during compression.
+    # parallel is False if compressed entries can not be written, see PARALLEL_WRITE
+    def __init__(self, workers: int = 4, compression=zipfile.ZIP_DEFLATED, compresslevel=None):
+        self.compression = compression
+        self.compresslevel = compresslevel
+        self.parallel = PARALLEL_WRITE
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ZipCompressor')
+
+    def submit(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        # returns Future of (zinfo, compressed) for write_compressed
+        zinfo = make_info(zinfo_or_arcname, self.compression, self.compresslevel)
+        if compress_type is not None:
+            zinfo.compress_type = compress_type
+        if compresslevel is not None:
+            set_compresslevel(zinfo, compresslevel)
+        return self.executor.submit(compress_entry, zinfo, data)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    import sys
+    for file_name in sys.argv[1:]:
+        print(file_name)
+        print(codec_report(codec_benchmark(file_name)))
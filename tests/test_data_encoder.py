@@ -0,0 +1,139 @@
+import io
+import zipfile
+
+import numpy
+import pytest
+
+from DataEncoder import (average, average_channel, channel_bytes, channel_chunks, channel_text, decode,
+                         read_channel, restore_x, uniform_x)
+
+
+def loop_text(y, x=None, avg=1):
+    # per-sample encoder of PrototypeDumperDevice.Channel.save_data before vectorization
+    outbuf = ''
+    if x is None:
+        fmt = '%f'
+        fmtcrlf = fmt + '\r\n'
+        n = len(y)
+        ys = 0.0
+        ns = 0.0
+        for k in range(n - 2):
+            ys += y[k]
+            ns += 1.0
+            if ns >= avg:
+                outbuf += (fmtcrlf % (ys / ns)).replace(",", ".")
+                ys = 0.0
+                ns = 0.0
+        ys += y[n - 1]
+        ns += 1.0
+        outbuf += (fmt % (ys / ns)).replace(",", ".")
+        return outbuf
+    fmt = '%f; %f'
+    fmtcrlf = fmt + '\r\n'
+    n = min(len(x), len(y))
+    xs = 0.0
+    ys = 0.0
+    ns = 0.0
+    for k in range(n - 2):
+        xs += x[k]
+        ys += y[k]
+        ns += 1.0
+        if ns >= avg:
+            outbuf += (fmtcrlf % (xs / ns, ys / ns)).replace(",", ".")
+            xs = 0.0
+            ys = 0.0
+            ns = 0.0
+    xs += x[n - 1]
+    ys += y[n - 1]
+    ns += 1.0
+    outbuf += (fmt % (xs / ns, ys / ns)).replace(",", ".")
+    return outbuf
+
+
+def loop_average(a, avg=1):
+    # per-sample block averaging of ShotDumper before vectorization
+    result = []
+    s = 0.0
+    n = 0
+    for v in a:
+        s += v
+        n += 1
+        if n >= avg:
+            result.append(s / n)
+            s = 0.0
+            n = 0
+    if n > 0:
+        result.append(s / n)
+    return result
+
+
+DTYPES = (numpy.float64, numpy.float32, numpy.int16)
+
+
+def signal(n, dtype, seed=0):
+    values = numpy.random.default_rng(seed).normal(100.0, 30.0, n)
+    return values.astype(dtype)
+
+
+@pytest.mark.parametrize('dtype', DTYPES)
+@pytest.mark.parametrize('n,avg', [(1, 1), (2, 1), (3, 2), (1000, 1), (1000, 3), (1001, 10), (997, 1000)])
+def test_channel_text_equals_loop(dtype, n, avg):
+    y = signal(n, dtype)
+    x = numpy.linspace(0.0, 0.1, n).astype(dtype) if dtype != numpy.int16 else numpy.arange(n, dtype=dtype)
+    assert channel_text(y, None, avg) == loop_text(y, None, avg)
+    assert channel_text(y, x, avg) == loop_text(y, x, avg)
+
+
+@pytest.mark.parametrize('dtype', DTYPES)
+@pytest.mark.parametrize('avg', [1, 2, 7])
+def test_average_equals_loop(dtype, avg):
+    a = signal(100, dtype)
+    assert average(a, avg).tolist() == [float(v) for v in loop_average(a, avg)]
+
+
+@pytest.mark.parametrize('save_format', ['txt', 'npy', 'f32'])
+@pytest.mark.parametrize('with_x', [False, True])
+def test_chunks_join_to_whole(save_format, with_x):
+    y = signal(1000, numpy.float32)
+    x = numpy.linspace(0.0, 1.0, 1000) if with_x else None
+    if save_format == 'txt':
+        whole = channel_text(y, x, 3).encode()
+    else:
+        whole = channel_bytes(y, x, 3, save_format)
+    assert b''.join(channel_chunks(y, x, 3, save_format, lines=64)) == whole
+
+
+@pytest.mark.parametrize('save_format', ['npy', 'f32'])
+def test_binary_formats_are_float64_averages(save_format):
+    y = signal(100, numpy.float32)
+    x, values = decode('chany00.' + save_format, channel_bytes(y, None, 4, save_format))
+    assert x is None
+    expected = average_channel(y, 4, numpy.float64)
+    if save_format == 'f32':
+        expected = expected.astype(numpy.float32)
+    assert numpy.array_equal(values, expected)
+
+
+def test_decode_text():
+    y = signal(50, numpy.float64)
+    x = numpy.linspace(0.0, 1.0, 50)
+    xd, yd = decode('chany00.txt', channel_text(y, x))
+    assert numpy.allclose(xd, average_channel(x), atol=1e-6)
+    assert numpy.allclose(yd, average_channel(y), atol=1e-6)
+
+
+def test_uniform_x_restored():
+    x = numpy.linspace(0.0, 1.0, 1001)
+    y = signal(1001, numpy.float64)
+    x0, dx, x_last = uniform_x(x, 5)
+    xa = average_channel(x, 5)
+    assert numpy.allclose(restore_x(len(xa), x0, dx, x_last), xa, rtol=0.0, atol=1e-12)
+    assert uniform_x(numpy.sort(signal(100, numpy.float64)), 1) is None
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zip_file:
+        zip_file.writestr('A/chany00.txt', channel_text(y, None, 5))
+        zip_file.writestr('A/paramchany00.txt', 'x0=%r\r\ndx=%r\r\nx_last=%r\r\n' % (x0, dx, x_last))
+    with zipfile.ZipFile(buf) as zip_file:
+        xr, yr = read_channel(zip_file, 'A/chany00.txt')
+    assert numpy.allclose(xr, xa, atol=1e-12)
+    assert len(yr) == len(xa)
@@ -0,0 +1,86 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from ShotContainer import INDEX_ROW, ShotContainer
+
+
+def shot_zip(shot):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as zip_file:
+        zip_file.writestr('A/chany00.txt', '%d.000000' % shot)
+    return data.getvalue()
+
+
+@pytest.fixture
+def file_name(tmp_path):
+    file_name = str(tmp_path / '2024-03-01.shots')
+    with ShotContainer(file_name, 'a') as container:
+        for shot in (1, 2, 3):
+            container.append(shot, 100.0 + shot, shot_zip(shot))
+    return file_name
+
+
+def test_append_and_read(file_name):
+    container = ShotContainer(file_name)
+    assert container.shots() == [1, 2, 3]
+    assert container.find(2)[1] == 102.0
+    with container.open(3) as zip_file:
+        assert zip_file.read('A/chany00.txt') == b'3.000000'
+    with pytest.raises(KeyError):
+        container.find(4)
+
+
+def test_index_row_appended(file_name):
+    with open(os.path.splitext(file_name)[0] + '.idx', 'rb') as f:
+        index = f.read()
+    with ShotContainer(file_name, 'a') as container:
+        offset = container.next_offset()
+        assert container.append(4, 104.0, shot_zip(4)) == offset
+    with open(container.index_file_name, 'rb') as f:
+        data = f.read()
+    assert data[:len(index)] == index
+    assert INDEX_ROW.unpack(data[len(index):]) == (4, 104.0, offset, len(shot_zip(4)))
+
+
+def test_reader_does_not_modify(file_name):
+    size = os.path.getsize(file_name)
+    # record of writer in progress
+    with open(file_name, 'ab') as f:
+        f.write(b'TSDS' + b'\0' * 30)
+    container = ShotContainer(file_name)
+    assert container.shots() == [1, 2, 3]
+    assert os.path.getsize(file_name) == size + 34
+    with pytest.raises(ValueError):
+        container.append(4, 104.0, shot_zip(4))
+
+
+def test_writer_recovers(file_name):
+    size = os.path.getsize(file_name)
+    index_file_name = os.path.splitext(file_name)[0] + '.idx'
+    with open(file_name, 'ab') as f:
+        f.write(b'TSDS' + b'\0' * 30)
+    # torn index row
+    with open(index_file_name, 'ab') as f:
+        f.write(b'\1' * 5)
+    with ShotContainer(file_name, 'a') as container:
+        assert container.shots() == [1, 2, 3]
+    assert os.path.getsize(file_name) == size
+    assert os.path.getsize(index_file_name) == 3 * INDEX_ROW.size
+
+
+def test_lost_index_is_rebuilt(file_name):
+    os.remove(os.path.splitext(file_name)[0] + '.idx')
+    assert ShotContainer(file_name).shots() == []
+    with ShotContainer(file_name, 'a') as container:
+        assert container.shots() == [1, 2, 3]
+    assert [row[1] for row in ShotContainer(file_name).rows] == [101.0, 102.0, 103.0]
+
+
+def test_single_writer(file_name):
+    with ShotContainer(file_name, 'a'):
+        with pytest.raises(RuntimeError):
+            ShotContainer(file_name, 'a')
+    ShotContainer(file_name, 'a').close()
@@ -0,0 +1,50 @@
+import io
+import os
+import zipfile
+
+from ShotContainer import ShotContainer
+from ShotDedup import REF_SUFFIX, ShotDedup, open_location, read_entry
+
+
+def write_shot(container, dedup, shot, data):
+    location = '%s#%d@%d' % (container.file_name, shot, container.next_offset())
+    dedup.begin(location)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        ref = dedup.check('A/chany00.txt', data)
+        if ref is None:
+            zip_file.writestr('A/chany00.txt', data)
+        else:
+            zip_file.writestr('A/chany00.txt' + REF_SUFFIX, ref)
+    container.append(shot, 100.0 + shot, buffer.getvalue())
+    dedup.commit()
+    return location
+
+
+def test_reference_after_shot_number_reset(tmp_path):
+    file_name = str(tmp_path / '2024-03-01.shots')
+    dedup = ShotDedup()
+    with ShotContainer(file_name, 'a') as container:
+        write_shot(container, dedup, 1, b'first ' * 100)
+        location = write_shot(container, dedup, 2, b'first ' * 100)
+        # shot counter is reset, shot 1 is written again with other data
+        write_shot(container, dedup, 1, b'second ' * 100)
+    size = os.path.getsize(file_name)
+    with open_location(location) as zip_file:
+        assert zip_file.namelist() == ['A/chany00.txt' + REF_SUFFIX]
+        assert read_entry(zip_file, 'A/chany00.txt', str(tmp_path)) == b'first ' * 100
+    # the container is not modified by resolution of references
+    assert os.path.getsize(file_name) == size
+
+
+def test_no_self_reference(tmp_path):
+    dedup = ShotDedup()
+    location = str(tmp_path / 'a.zip')
+    dedup.begin(location)
+    assert dedup.check('A/chany00.txt', b'data ' * 100) is None
+    dedup.commit()
+    # the same zip file is written again
+    dedup.begin(location)
+    assert dedup.check('A/chany00.txt', b'data ' * 100) is None
+    dedup.begin(str(tmp_path / 'b.zip'))
+    assert dedup.check('A/chany00.txt', b'data ' * 100) is not None
@@ -0,0 +1,76 @@
+import math
+import os
+
+from ShotIndex import ShotIndex
+
+LINE = ('2024-03-01 12:00:05; Shot=17; Shot_time=1709294405.25; chany00 =   1.25 V; '
+        'ai00 =   0.00 A; flag = on; File=2024-03-01_120005.zip\n')
+
+
+def test_parse_line():
+    shot = ShotIndex.parse_line(LINE)
+    assert shot['date'] == '2024-03-01 12:00:05'
+    assert shot['shot'] == 17
+    assert shot['time'] == 1709294405.25
+    assert shot['file'] == '2024-03-01_120005.zip'
+    assert [mark[0] for mark in shot['marks']] == ['chany00', 'ai00', 'flag']
+    assert shot['marks'][0][1:] == (1.25, 'V')
+    assert shot['marks'][1][1:] == (0.0, 'A')
+    # not numeric mark value
+    assert math.isnan(shot['marks'][2][1])
+
+
+def test_parse_header_without_file():
+    # shot header written before items, used by open_shot
+    shot = ShotIndex.parse_line('2024-03-01 12:00:05; Shot=3; Shot_time=1709294405.0')
+    assert (shot['shot'], shot['time'], shot['file'], shot['marks']) == (3, 1709294405.0, None, [])
+
+
+def test_parse_bad_values():
+    shot = ShotIndex.parse_line('2024-03-01 12:00:05; Shot=x; Shot_time=; no value; File=a.shots#2')
+    assert shot['shot'] is None
+    assert shot['time'] is None
+    assert shot['marks'] == []
+    assert shot['file'] == 'a.shots#2'
+    # lines without shot number are not indexed
+    index = ShotIndex(':memory:')
+    assert not index.add_line(index.connect(), 'restart', 'a.log')
+
+
+def test_last_line(tmp_path):
+    file_name = str(tmp_path / 'a.log')
+    with open(file_name, 'w') as f:
+        f.write('first\n' + 'x' * 100 + '\n' + LINE + '\n')
+    assert ShotIndex.last_line(file_name, 16) == LINE.rstrip('\n')
+
+
+def test_index(tmp_path):
+    folder = tmp_path / '2024' / '2024-03' / '2024-03-01'
+    os.makedirs(str(folder))
+    log_file_name = str(folder / '2024-03-01.log')
+    with open(log_file_name, 'w') as f:
+        f.write(LINE)
+        f.write(LINE.replace('Shot=17', 'Shot=18').replace('1.25 V', '2.50 V'))
+    index = ShotIndex(str(tmp_path / 'shots.db'), str(tmp_path))
+    assert index.backfill() == 2
+    # lines are indexed once
+    assert index.backfill() == 0
+    assert not index.add_last_shot(log_file_name)
+    rows = index.find('chany00', 2.0)
+    assert [(row[0], row[2], row[3]) for row in rows] == [(18, '2024/2024-03/2024-03-01/2024-03-01_120005.zip', 2.5)]
+    assert index.marks(17)['chany00'] == (1.25, 'V')
+
+
+def test_index_container_location(tmp_path):
+    folder = tmp_path / '2024' / '2024-03' / '2024-03-01'
+    os.makedirs(str(folder))
+    log_file_name = str(folder / '2024-03-01.log')
+    with open(log_file_name, 'w') as f:
+        f.write(LINE.replace('2024-03-01_120005.zip', '2024-03-01.shots#17@40'))
+        # shot number repeated after counter reset
+        f.write(LINE.replace('12:00:05', '12:10:05').replace('1709294405.25', '1709295005.25')
+                .replace('2024-03-01_120005.zip', '2024-03-01.shots#17@1000'))
+    index = ShotIndex(str(tmp_path / 'shots.db'), str(tmp_path))
+    assert index.backfill() == 2
+    assert [row[2] for row in index.find('chany00')] == ['2024/2024-03/2024-03-01/2024-03-01.shots#17@40',
+                                                         '2024/2024-03/2024-03-01/2024-03-01.shots#17@1000']
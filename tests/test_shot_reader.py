@@ -0,0 +1,111 @@
+import zipfile
+
+import numpy
+import pytest
+
+from DataEncoder import channel_arrays, channel_bytes, channel_text, uniform_x
+from ShotContainer import ShotContainer
+from ShotReader import ShotReader
+
+X = numpy.linspace(0.0, 1.0, 1001)
+Y = numpy.sin(10.0 * X)
+PROPERTIES = 'label=Channel 0\r\nunit=V\r\n'
+
+
+def write_shot(zip_file, save_format, compression=zipfile.ZIP_STORED, properties=PROPERTIES):
+    # channels as written by Channel.save_properties and Channel.save_data
+    if save_format == 'txt':
+        data = channel_text(Y, X)
+    else:
+        data = channel_bytes(Y, X, save_format=save_format)
+    zip_file.writestr('A/paramchany00.txt', properties, compress_type=compression)
+    zip_file.writestr('A/chany00.' + save_format, data, compress_type=compression)
+    # uniform x is saved as properties instead of data column
+    x0, dx, x_last = uniform_x(X)
+    zip_file.writestr('B/paramchany01.txt', PROPERTIES + 'x0=%r\r\ndx=%r\r\nx_last=%r\r\n' % (x0, dx, x_last),
+                      compress_type=compression)
+    zip_file.writestr('B/chany01.' + save_format, channel_bytes(Y, save_format=save_format)
+                      if save_format != 'txt' else channel_text(Y), compress_type=compression)
+
+
+def expected(save_format):
+    values = channel_arrays(Y, X)
+    if save_format == 'f32':
+        values = values.astype('<f4')
+    if save_format == 'txt':
+        values = numpy.round(values, 6)
+    return values[:, 0], values[:, 1]
+
+
+@pytest.mark.parametrize('save_format', ['npy', 'f32', 'txt'])
+def test_round_trip(tmp_path, save_format):
+    file_name = str(tmp_path / 'shot.zip')
+    with zipfile.ZipFile(file_name, 'w') as zip_file:
+        write_shot(zip_file, save_format)
+    x, y = expected(save_format)
+    with ShotReader(file_name) as reader:
+        assert reader.folders() == ['A', 'B']
+        assert reader.channels() == ['A/chany00', 'B/chany01']
+        channel = reader['A/chany00']
+        assert channel.save_format == save_format
+        assert channel.params['label'] == 'Channel 0'
+        assert channel.params['unit'] == 'V'
+        numpy.testing.assert_allclose(channel.x, x, atol=1e-6)
+        numpy.testing.assert_allclose(channel.y, y, atol=1e-6)
+        # x column restored from x0, dx, x_last properties
+        channel = reader['B/chany01']
+        assert 'dx' in channel.params
+        numpy.testing.assert_allclose(channel.x, channel_arrays(Y, X)[:, 0], atol=1e-9)
+        assert channel.x[-1] == X[-1]
+        numpy.testing.assert_allclose(channel.y, y, atol=1e-6)
+
+
+@pytest.mark.parametrize('save_format', ['npy', 'f32'])
+def test_stored_entries_are_mapped(tmp_path, save_format):
+    file_name = str(tmp_path / 'shot.zip')
+    with zipfile.ZipFile(file_name, 'w') as zip_file:
+        write_shot(zip_file, save_format)
+    reader = ShotReader(file_name)
+    y = reader['A/chany00'].y
+    # zero copy read only view of the file
+    assert reader._mmap is not None
+    assert not y.flags.owndata
+    assert not y.flags.writeable
+    with ShotReader(file_name, use_mmap=False) as copy:
+        numpy.testing.assert_array_equal(copy['A/chany00'].y, y)
+        assert copy._mmap is None
+    del y
+    reader.close()
+
+
+def test_compressed_entries_are_decoded(tmp_path):
+    file_name = str(tmp_path / 'shot.zip')
+    with zipfile.ZipFile(file_name, 'w') as zip_file:
+        write_shot(zip_file, 'npy', zipfile.ZIP_DEFLATED)
+    with ShotReader(file_name) as reader:
+        numpy.testing.assert_array_equal(reader['A/chany00'].y, expected('npy')[1])
+        assert reader._mmap is None
+
+
+@pytest.mark.parametrize('save_format', ['npy', 'f32', 'txt'])
+def test_container_record(tmp_path, save_format):
+    file_name = str(tmp_path / '2024-03-01.shots')
+    offsets = []
+    with ShotContainer(file_name, 'a') as container:
+        for shot in (1, 2):
+            buffer = tmp_path / ('%d.zip' % shot)
+            with zipfile.ZipFile(str(buffer), 'w') as zip_file:
+                write_shot(zip_file, save_format, properties=PROPERTIES + 'shot=%d\r\n' % shot)
+            offsets.append(container.append(1, 100.0 + shot, buffer.read_bytes()))
+    x, y = expected(save_format)
+    container = ShotContainer(file_name)
+    for shot, offset in zip((1, 2), offsets):
+        # shot number repeats, record is selected by offset
+        with container.reader(1, offset) as reader:
+            assert reader.offset == offset
+            assert reader['A/chany00'].params['shot'] == str(shot)
+            numpy.testing.assert_allclose(reader['A/chany00'].x, x, atol=1e-6)
+            numpy.testing.assert_allclose(reader['A/chany00'].y, y, atol=1e-6)
+            numpy.testing.assert_allclose(reader['B/chany01'].x, channel_arrays(Y, X)[:, 0], atol=1e-9)
+            # binary entries are mapped from container file at record offset
+            assert (reader._mmap is not None) == (save_format != 'txt')
@@ -0,0 +1,53 @@
+import io
+import zipfile
+
+import pytest
+
+from ShotBuffer import ShotBuffer
+from ZipCompressor import ZipCompressor, codec_benchmark, parse_codec
+
+ENTRIES = [('A/chany00.txt', '1.000000\r\n2.000000\r\n' * 1000), ('A/chany01.npy', bytes(range(256)) * 100)]
+
+
+def write_shot(parallel, compression='deflate:6', stream=False):
+    buffer = ShotBuffer('A')
+    for name, data in ENTRIES:
+        buffer.writestr(name, data)
+    if stream:
+        buffer.writestream('A/chany02.txt', iter([b'3.0\r\n'] * 100))
+    buffer.set_compression(*parse_codec(compression))
+    compressor = ZipCompressor(2)
+    compressor.parallel = parallel
+    buffer.compress(compressor)
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as zip_file:
+        buffer.flush(io.StringIO(), zip_file)
+    compressor.shutdown()
+    return data
+
+
+@pytest.mark.parametrize('compression', ['stored', 'deflate:1', 'bzip2', 'lzma'])
+@pytest.mark.parametrize('parallel', [True, False])
+def test_written_entries(parallel, compression):
+    with zipfile.ZipFile(write_shot(parallel, compression, True), 'r') as zip_file:
+        assert zip_file.testzip() is None
+        for name, data in ENTRIES:
+            assert zip_file.read(name) == (data.encode() if isinstance(data, str) else data)
+            assert zip_file.getinfo(name).compress_type == parse_codec(compression)[0]
+        assert zip_file.read('A/chany02.txt') == b'3.0\r\n' * 100
+
+
+def test_fallback_is_compressed_by_writer():
+    with zipfile.ZipFile(write_shot(True), 'r') as parallel, zipfile.ZipFile(write_shot(False), 'r') as fallback:
+        for name, _ in ENTRIES:
+            assert parallel.getinfo(name).compress_size == fallback.getinfo(name).compress_size
+
+
+def test_codec_benchmark(tmp_path):
+    file_name = str(tmp_path / 'shot.zip')
+    with open(file_name, 'wb') as f:
+        f.write(write_shot(False).getvalue())
+    rows = codec_benchmark(file_name, ('stored', 'deflate:9'))
+    assert [row[0] for row in rows] == ['stored', 'deflate:9']
+    assert rows[0][2] == rows[0][1]
+    assert rows[1][2] < rows[1][1]